@@ -0,0 +1,179 @@
+import sys
+import os
+import time
+import tracemalloc
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from dsl import *
+from dsl import _InternedRef
+from test_cases import *
+from bottom_up import ProgramBank, bottom_up_generator, bottom_up_xml, np
+
+def time_per_call(function, repetitions):
+    """
+    Returns the average wall time of `function()` in microseconds.
+    """
+    start_time = time.perf_counter()
+    for _ in range(repetitions):
+        function()
+    return (time.perf_counter() - start_time) / repetitions * 1e6
+
+def benchmark_expression_hashing(depths=(1, 10, 50, 100, 200), repetitions=2000):
+    """
+    Measures the cost of inserting an expression of increasing depth into a set,
+    comparing the old str()-based hashing against the cached structural hash.
+    """
+    print("Set insertion cost by expression depth (microseconds per insertion)\n")
+    print(f"{'depth':>8} {'str()-based':>14} {'structural':>14}")
+    for depth in depths:
+        expr = XMLVariable('input')
+        for _ in range(depth):
+            expr = RemoveText(expr)
+
+        def insert_by_str():
+            bank = set()
+            bank.add(str(expr))
+            return str(expr) in bank
+
+        def insert_structural():
+            bank = set()
+            bank.add(expr)
+            return expr in bank
+
+        print(f"{depth:>8} {time_per_call(insert_by_str, repetitions):>14.2f} {time_per_call(insert_structural, repetitions):>14.2f}")
+
+def deep_size(root, seen):
+    """
+    Returns the `sys.getsizeof` bytes of `root` and of every object it reaches through containers, xml values
+    and expression arguments, skipping (and adding to) the ids in `seen`, so shared objects are counted once.
+    """
+    size, stack = 0, [root]
+    while stack:
+        obj = stack.pop()
+        if obj is None or isinstance(obj, type) or id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, (tuple, list)):
+            stack.extend(obj)
+        elif isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, XMLValue):
+            stack.extend((obj.tag, obj.attributes, obj.text, obj.child))
+        elif isinstance(obj, Expression):
+            stack.append(obj._arguments)
+    return size
+
+def traced_bytes(build):
+    """
+    Returns what `build()` returns and the bytes it left allocated, measured with tracemalloc.
+    """
+    tracemalloc.start()
+    result = build()
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, allocated
+
+_unslotted_classes = {}
+
+def unslotted_class(operator):
+    """
+    Plain class with the fields of `operator` in a per-instance __dict__, the layout of expression nodes before they were slotted.
+    """
+    if operator not in _unslotted_classes:
+        _unslotted_classes[operator] = type(f"Unslotted{operator.__name__}", (), {"fields": operator.__slots__})
+    return _unslotted_classes[operator]
+
+def node_bank(program_bank, make_node):
+    """
+    The bank as it was stored before the arena: lists of (node, outputs) pairs by (type, size), where
+    make_node(operator, arguments) builds the node of a program from the nodes of its arguments.
+    """
+    nodes, by_size_and_type = [], {}
+    for row in range(len(program_bank)):
+        operator_id = program_bank.operator_ids[row]
+        if operator_id < 0:
+            node = program_bank.terminals[-1 - operator_id]
+        else:
+            # children come before their parents, so every program reuses the nodes of its children
+            node = make_node(program_bank.operators[operator_id], [nodes[child] for child in program_bank.children(row)])
+        nodes.append(node)
+        key = (program_bank.type_names[program_bank.types[row]], program_bank.sizes[row])
+        by_size_and_type.setdefault(key, []).append((node, program_bank.outputs[row]))
+    return by_size_and_type
+
+def benchmark_bank_memory(test_case=test_case_10, bound=17):
+    """
+    Enumerates the bank of `test_case` up to `bound` (hundreds of thousands of programs on test case 10) and
+    measures it in three layouts: hash-consed nodes with a per-instance __dict__ (before slotted nodes),
+    slotted `Expression` nodes, and the current arena of integer rows with its (type, size) index.
+    The outputs are the same tuples in every layout, so they are measured once, with `sys.getsizeof`.
+    """
+    program_bank = ProgramBank()
+    for _ in bottom_up_generator(bound, operators, test_case, program_bank):
+        pass
+    programs = len(program_bank)
+    output_bytes = deep_size(program_bank.outputs, set())
+
+    interned = {}
+    def make_unslotted(operator, arguments):
+        # fields, `_arguments` and `_hash` in the instance __dict__, and a weak entry in the intern table, as HashConsed did
+        node = unslotted_class(operator)()
+        for name, argument in zip(node.fields, arguments):
+            setattr(node, name, argument)
+        node._arguments = tuple(arguments)
+        node._hash = hash((operator.__name__,) + node._arguments)
+        reference = _InternedRef(node)
+        reference.key = (operator,) + node._arguments
+        interned[reference.key] = reference
+        return node
+
+    def copy_arena():
+        arena = ProgramBank()
+        arena.operators, arena.terminals = program_bank.operators, program_bank.terminals
+        for row in range(programs):
+            arena._add_row(program_bank.operator_ids[row], program_bank.children(row), program_bank.sizes[row],
+                           program_bank.type_names[program_bank.types[row]], program_bank.outputs[row])
+        return arena
+
+    layouts = [("dict-backed nodes", lambda: (node_bank(program_bank, make_unslotted), interned)),
+               ("slotted nodes", lambda: node_bank(program_bank, lambda operator, arguments: operator(*arguments))),
+               ("arena", copy_arena)]
+    print(f"\nBank memory for {programs} programs of size up to {bound}\n")
+    print(f"{'layout':>20} {'bank (MiB)':>12} {'bytes/program':>14} {'with outputs':>14}")
+    totals = []
+    for label, build in layouts:
+        bank, bank_bytes = traced_bytes(build)
+        del bank
+        interned.clear()
+        totals.append(bank_bytes + output_bytes)
+        print(f"{label:>20} {bank_bytes / 2**20:>12.2f} {bank_bytes / programs:>14.0f} {(bank_bytes + output_bytes) / programs:>14.0f}")
+    print(f"{'outputs':>20} {output_bytes / 2**20:>12.2f} {output_bytes / programs:>14.0f}")
+    print(f"\nThe arena takes {totals[2] / totals[0]:.0%} of the memory of dict-backed nodes with outputs, "
+          f"and {(totals[2] - output_bytes) / (totals[0] - output_bytes):.0%} without them")
+
+def benchmark_many_examples(example_counts=(10, 40, 160, 640)):
+    """
+    Synthesizes the attribute-to-child conversion of test case 4 from more and more input/output pairs,
+    with the dictionary-based and, if numpy is installed, the columnar observational-equivalence tables.
+    """
+    columnar_modes = [False] if np is None else [False, True]
+    print("\nSynthesis time by number of examples (seconds)\n")
+    print(f"{'examples':>8} {'programs':>10} {'dictionary':>12} {'columnar':>12}")
+    for number_of_examples in example_counts:
+        test_case = [({"input": xml_to_dsl(f'<ownedComment body="This is body {i}." />')},
+                      xml_to_dsl(f'<ownedComment><body>This is body {i}.</body></ownedComment>'))
+                     for i in range(number_of_examples)]
+        times = []
+        for columnar in columnar_modes:
+            start_time = time.perf_counter()
+            _, expression_count = bottom_up_xml(20, operators, test_case, columnar)
+            times.append(f"{time.perf_counter() - start_time:>12.2f}")
+        if np is None:
+            times.append(f"{'no numpy':>12}")
+        print(f"{number_of_examples:>8} {expression_count:>10} {' '.join(times)}")
+
+if __name__ == "__main__":
+    benchmark_expression_hashing()
+    benchmark_bank_memory()
+    benchmark_many_examples()
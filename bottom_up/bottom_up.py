@@ -1,6 +1,6 @@
 import inspect
 import itertools
-import json
+from array import array
 import sys
 import os
 import time
@@ -8,6 +8,20 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from dsl import *
 from test_cases import *
 
+from checkpoint import load_checkpoint, save_checkpoint, task_fingerprint
+from parallel import enumerate_shard, run_level, shard_tasks
+from symmetry import SymmetryBreaker
+
+# parallel enumeration: by default, levels with fewer candidates than the threshold run in-process,
+# and larger ones are split into tasks of about `parallel_shard_size` candidates
+default_parallel_threshold = 200000
+parallel_shard_size = 50000
+
+try:
+    import numpy as np
+except ImportError:  # only needed for the columnar equivalence table
+    np = None
+
 # suggested first thing: variables and constants should be treated the same, because they are both leaves in syntax trees
 # after computing `variables_and_constants`, you should no longer refer to `constants`. express everything in terms of `variables_and_constants`
 # `make_variable` is just a helper function for making variables that smartly wraps the variable name in the correct class depending on the type of the variable
@@ -20,16 +34,307 @@ def make_variable(variable_name, variable_value):
         return XMLVariable(variable_name)
     assert False, f"Unsupported input type: {type(variable_value)}"
 
-def bottom_up_generator(global_bound, operators, input_outputs):
+class ProgramBank():
+    """
+    Arena of the programs retained by `bottom_up_generator`.
+    Every program is a row with an integer id: its operator id, the ids of its children, its size,
+    its type, and its outputs on every example. Leaves are stored as negative operator ids that index
+    `terminals`. `Expression` objects are only rebuilt on request, via `expression`.
+    """
+
+    def __init__(self):
+        self.operators = []  # operator id -> operator class
+        self.terminals = []  # terminal index -> leaf expression
+        self.type_names = []  # type id -> type name
+        self.operator_ids = array('h')  # >= 0: index into operators, < 0: -1 - index into terminals
+        self.child_starts = array('q', [0])  # children of row i are child_ids[child_starts[i]:child_starts[i + 1]]
+        self.child_ids = array('q')
+        self.sizes = array('H')
+        self.types = array('B')
+        self.outputs = []  # row id -> tuple of outputs on every example
+        self.by_size_and_type = {}  # (type name, size) -> array of row ids
+
+    def __len__(self):
+        return len(self.outputs)
+
+    def operator_id(self, operator):
+        if operator not in self.operators:
+            self.operators.append(operator)
+        return self.operators.index(operator)
+
+    def type_id(self, type_name):
+        if type_name not in self.type_names:
+            self.type_names.append(type_name)
+        return self.type_names.index(type_name)
+
+    def _add_row(self, operator_id, child_ids, size, type_name, outputs):
+        row = len(self.outputs)
+        self.operator_ids.append(operator_id)
+        self.child_ids.extend(child_ids)
+        self.child_starts.append(len(self.child_ids))
+        self.sizes.append(size)
+        self.types.append(self.type_id(type_name))
+        self.outputs.append(outputs)
+        if (type_name, size) not in self.by_size_and_type:
+            self.by_size_and_type[(type_name, size)] = array('q')
+        self.by_size_and_type[(type_name, size)].append(row)
+        return row
+
+    def add_terminal(self, expr, outputs, size=1):
+        self.terminals.append(expr)
+        return self._add_row(-len(self.terminals), (), size, expr.return_type, outputs)
+
+    def add(self, operator_id, child_ids, size, outputs):
+        return self._add_row(operator_id, child_ids, size, self.operators[operator_id].return_type, outputs)
+
+    def children(self, row):
+        return self.child_ids[self.child_starts[row]:self.child_starts[row + 1]]
+
+    def expression(self, row):
+        """
+        Rebuilds the `Expression` stored at `row`.
+        """
+        operator_id = self.operator_ids[row]
+        if operator_id < 0:
+            return self.terminals[-1 - operator_id]
+        return self.operators[operator_id](*[self.expression(child) for child in self.children(row)])
+
+class ColumnarEquivalence():
+    """
+    Observational-equivalence table over rows of value ids (one column per example), stored in a NumPy matrix.
+    Candidates are admitted in batches: rows are hashed in one vectorized pass, duplicates inside the batch
+    and against the table are found by comparing hashes, and hash hits are confirmed by comparing id rows.
+    """
+    batch_size = 4096
+
+    def __init__(self, number_of_examples):
+        if np is None:
+            raise ImportError("the columnar equivalence table requires numpy")
+        self.rows = np.empty((1024, number_of_examples), dtype=np.int64)
+        self.count = 0
+        self.table = {}  # row hash -> indices into `rows`
+        self.multipliers = np.random.default_rng(0).integers(1, 2**63, size=number_of_examples, dtype=np.uint64) | np.uint64(1)
+
+    def __len__(self):
+        return self.count
+
+    def _hash(self, ids):
+        mixed = (ids.astype(np.uint64) + np.uint64(1)) * self.multipliers
+        mixed ^= mixed >> np.uint64(29)
+        return mixed.sum(axis=1, dtype=np.uint64)
+
+    def _append(self, row_hash, ids_row):
+        if self.count == len(self.rows):
+            self.rows = np.concatenate([self.rows, np.empty_like(self.rows)])
+        self.rows[self.count] = ids_row
+        self.table.setdefault(row_hash, []).append(self.count)
+        self.count += 1
+
+    def _admit_exact(self, hashes, ids):
+        # slow path, only taken when two different rows share a hash
+        admitted = []
+        for index, (row_hash, ids_row) in enumerate(zip(hashes, ids)):
+            if not any(np.array_equal(self.rows[j], ids_row) for j in self.table.get(row_hash, ())):
+                self._append(row_hash, ids_row)
+                admitted.append(index)
+        return admitted
+
+    def admit(self, ids):
+        """
+        Adds the rows of `ids` (a candidates x examples matrix of value ids) that are not yet in the table.
+        Returns the indices of the admitted rows, in batch order.
+        """
+        hashes = self._hash(ids)
+        _, first, inverse = np.unique(hashes, return_index=True, return_inverse=True)
+        # every row must equal the first row of the batch with the same hash
+        if not (ids == ids[first[inverse.reshape(-1)]]).all():
+            return self._admit_exact(hashes.tolist(), ids)
+        first.sort()
+        first_hashes = hashes[first].tolist()
+
+        new, seen, seen_rows = [], [], []
+        for index, row_hash in zip(first.tolist(), first_hashes):
+            stored = self.table.get(row_hash)
+            if stored is None:
+                new.append(index)
+            elif len(stored) == 1:
+                seen.append(index)
+                seen_rows.append(stored[0])
+            else:
+                return self._admit_exact(hashes.tolist(), ids)
+        # hash hits must be true duplicates
+        if seen and not (ids[seen] == self.rows[seen_rows]).all():
+            return self._admit_exact(hashes.tolist(), ids)
+
+        for index in new:
+            self._append(int(hashes[index]), ids[index])
+        return new
+
+def bottom_up_generator(global_bound, operators, input_outputs, bank=None, columnar=False, memo=None, workers=None, coordinator=None, checkpoint=None, terminals=None, costs=None, symmetry=None, reachability=None, derivations=None, parallel_threshold=default_parallel_threshold):
     """
     Generates programs in a bottom-up manner using extraction operators.
+    Yields (row id, outputs) pairs, where the row id indexes `bank` (a `ProgramBank`, created if not given)
+    and outputs is the tuple of the program's values on every example.
+    The bank stores every retained program together with its outputs on all examples,
+    and programs that evaluate to ERROR on some example are discarded, so a new candidate is evaluated with one `operator.apply` per example on its arguments' stored outputs.
+    If `columnar` is set, outputs are interned to integer ids and observational equivalence is decided
+    in batches by a `ColumnarEquivalence` table instead of a dictionary keyed by output tuples.
+    If an `ApplicationMemo` is given, operator applications go through it.
+    If `workers` is set, each size level is sharded across that many forked processes (see parallel.py)
+    and merged in enumeration order, so the generated programs are the same as in sequential mode.
+    If a `Coordinator` is given (see distributed.py), levels are sharded across its remote workers instead.
+    Levels with fewer than `parallel_threshold` candidates are enumerated in-process in either case.
+    If `checkpoint` is a directory, the bank is saved there after every completed size level, and a previous
+    checkpoint of the same task is resumed from its last completed level.
+    `terminals` are the leaves to start from; by default they are harvested from `input_outputs` (see `make_terminals`).
+    If `costs` maps operator and terminal classes to positive integer costs (see pcfg.py), programs are enumerated
+    by increasing total cost instead of size, and `global_bound` bounds the cost. Classes missing from `costs`
+    cost 1, so uniform costs enumerate exactly as by size.
+    If a `SymmetryBreaker` is given (see symmetry.py), candidates that its rewrite rules prove redundant
+    are skipped before they are evaluated.
+    If a `ReachabilityPruner` is given (see reachability.py), programs that cannot become the target output of
+    `input_outputs` within `global_bound` are discarded like failing ones.
+    If `derivations` is given, it is called with (row, operator id, argument rows) for every evaluated program
+    that does not fail, including those equivalent to an earlier row, which is then the row passed (see version_space.py).
+    """
+    parallel = workers is not None or coordinator is not None
+    if parallel and (columnar or memo is not None or symmetry is not None):
+        raise ValueError("parallel enumeration cannot be combined with the columnar table, the memo or symmetry breaking")
+    if derivations is not None and (parallel or columnar or symmetry is not None or reachability is not None):
+        raise ValueError("derivations are only recorded by the sequential enumeration without pruning")
+    if reachability is not None and checkpoint is not None:
+        # a checkpoint of a pruned bank could not be resumed with a larger bound
+        raise ValueError("reachability pruning cannot be combined with checkpoints")
+    if bank is None:
+        bank = ProgramBank()
+    if reachability is not None:
+        reachability.reset(global_bound, operators, input_outputs)
+
+    completed_size = None
+    if checkpoint is not None:
+        fingerprint = task_fingerprint(operators, input_outputs, costs)
+        completed_size = load_checkpoint(checkpoint, fingerprint, bank)
+    if completed_size is None:
+        completed_size = 1
+        if terminals is None:
+            terminals = make_terminals(input_outputs)
+        for expr in terminals:
+            outputs = tuple(expr.evaluate(input) for input, _ in input_outputs)
+            bank.add_terminal(expr, outputs, production_cost(costs, type(expr)))
+
+    # rows by (type, size) and their outputs, indexed by row id
+    expr_by_size_and_type = bank.by_size_and_type
+    bank_outputs = bank.outputs
+
+    observational_equivalence = {}
+    if columnar:
+        value_store = ValueStore()
+        columnar_equivalence = ColumnarEquivalence(len(input_outputs))
+
+    # programs restored from a checkpoint are replayed, so the caller sees the same sequence as in an uninterrupted run
+    restored = [row for row in range(len(bank)) if bank.operator_ids[row] >= 0]
+    for row in restored:
+        observational_equivalence[bank_outputs[row]] = row
+    if columnar and restored:
+        columnar_equivalence.admit(np.array([[value_store.id(output) for output in bank_outputs[row]] for row in restored], dtype=np.int64))
+    for row in restored:
+        if bank.sizes[row] <= global_bound:
+            yield row, bank_outputs[row]
+
+    for size in range(completed_size + 1, global_bound + 1):
+        jobs = level_jobs(bank, operators, size, costs)
+
+        if parallel:
+            tasks = shard_tasks(bank, jobs, parallel_shard_size)
+            if sum((stop - start) * level_task_width(bank, keys) for _, keys, start, stop in tasks) < parallel_threshold:
+                # small levels are not worth forking for
+                results = (enumerate_shard(bank, observational_equivalence, task) for task in tasks)
+            elif coordinator is not None:
+                results = coordinator.run_level(bank, tasks)
+            else:
+                results = run_level(bank, observational_equivalence, tasks, workers)
+            # merge in task order, which is the sequential enumeration order
+            for (operator_id, _, _, _), found in zip(tasks, results):
+                return_type = bank.operators[operator_id].return_type
+                for args, outputs in found:
+                    if outputs not in observational_equivalence:
+                        # shards already drop failing programs
+                        if reachability is not None and reachability.unreachable(return_type, outputs, size):
+                            observational_equivalence[outputs] = None
+                            continue
+                        row = bank.add(operator_id, args, size, outputs)
+                        observational_equivalence[outputs] = row
+                        yield row, outputs
+        else:
+            for operator_id, keys in jobs:
+                operator = bank.operators[operator_id]
+                apply = memo.applier(operator) if memo is not None else operator.apply
+                argument_combinations = [expr_by_size_and_type[key] for key in keys]
+                redundant = None
+                if symmetry is not None:
+                    argument_combinations, redundant = symmetry.prune(bank, operator, argument_combinations)
+
+                if columnar:
+                    combinations = itertools.product(*argument_combinations)
+                    if redundant is not None:
+                        combinations = itertools.filterfalse(redundant, combinations)
+                    while True:
+                        batch = list(itertools.islice(combinations, ColumnarEquivalence.batch_size))
+                        if not batch:
+                            break
+                        batch_outputs = [tuple(map(apply, *[bank_outputs[arg] for arg in args])) for args in batch]
+                        ids = np.array([[value_store.id(output) for output in outputs] for outputs in batch_outputs], dtype=np.int64)
+                        for index in columnar_equivalence.admit(ids):
+                            # failing outputs stay in the table, so their duplicates are rejected there
+                            if ERROR in batch_outputs[index]:
+                                continue
+                            if reachability is not None and reachability.unreachable(operator.return_type, batch_outputs[index], size):
+                                continue
+                            row = bank.add(operator_id, batch[index], size, batch_outputs[index])
+                            yield row, batch_outputs[index]
+                    continue
+
+                # gen combinations of argument row ids for the operator
+                for args in itertools.product(*argument_combinations):
+                    if redundant is not None and redundant(args):
+                        continue
+                    # apply the operator to the stored outputs of its arguments, one example at a time
+                    # (xml values are interned, so the tuple hashes in O(1) per example)
+                    outputs = tuple(map(apply, *[bank_outputs[arg] for arg in args]))
+                    # add only unique outputs
+                    if outputs not in observational_equivalence:
+                        if ERROR in outputs:
+                            # programs that fail on an example are discarded; the outputs are remembered
+                            # so that other programs failing the same way are rejected by the lookup above
+                            observational_equivalence[outputs] = None
+                            continue
+                        if reachability is not None and reachability.unreachable(operator.return_type, outputs, size):
+                            # equivalent programs come no smaller, so they are rejected by the lookup too
+                            observational_equivalence[outputs] = None
+                            continue
+                        row = bank.add(operator_id, args, size, outputs)
+                        observational_equivalence[outputs] = row
+                        if derivations is not None:
+                            derivations(row, operator_id, args)
+                        yield row, outputs
+                    elif derivations is not None and observational_equivalence[outputs] is not None:
+                        derivations(observational_equivalence[outputs], operator_id, args)
+
+        if checkpoint is not None:
+            save_checkpoint(checkpoint, fingerprint, bank, size)
+
+def make_terminals(input_outputs):
+    """
+    Returns the leaves of the search: the input variables, and string constants for the attribute keys,
+    attribute values and tags that appear in the examples, each typed with its sort.
     """
     # extract vars from input
-    variables = list({make_variable(var_name, var_value)
-                      for inputs, _ in input_outputs
-                      for var_name, var_value in inputs.items()})
+    # sets are listed in sorted order, so the enumeration order does not depend on string hashing
+    variables = sorted({make_variable(var_name, var_value)
+                        for inputs, _ in input_outputs
+                        for var_name, var_value in inputs.items()}, key=lambda variable: variable.name)
     
-    def collect_constant_strings_env(xml, attribute_keys, tags):
+    def collect_constant_strings_env(xml, attribute_keys, input_strings, tags):
         if xml is None:
             return
         # add tag if it exists
@@ -37,84 +342,85 @@ def bottom_up_generator(global_bound, operators, input_outputs):
             tags.add(xml.tag.content)
         # add attrib keys
         attribute_keys.update(attr_key.content for attr_key, _ in xml.attributes)
+        # values and texts that a program can copy from the input
+        input_strings.update(attr_value.content for _, attr_value in xml.attributes)
+        if xml.text:
+            input_strings.add(xml.text.content)
         # recurse for child
         if xml.child:
-            collect_constant_strings_env(xml.child, attribute_keys, tags)
+            collect_constant_strings_env(xml.child, attribute_keys, input_strings, tags)
 
-    def collect_constant_strings_target(xml, attribute_keys, tags):
+    def collect_constant_strings_target(xml, attribute_keys, input_strings, attribute_values, tags):
         if xml is None:
             return
         # add tag if it exists
         if xml.tag:
             tags.add(xml.tag.content)
-        # add attributes constants
-        attribute_keys.update(attr_value.content for attr_key, attr_value in xml.attributes if attr_key.content not in tags and attr_key.content not in attribute_keys)
+        # add attributes constants: values of new keys, and values that cannot be copied from the example's input
+        # (e.g. visibility="private" becoming "public")
+        attribute_values.update(attr_value.content for attr_key, attr_value in xml.attributes
+                                if (attr_key.content not in tags and attr_key.content not in attribute_keys) or attr_value.content not in input_strings)
         attribute_keys.update(attr_key.content for attr_key, _ in xml.attributes)
         # recurse for child
         if xml.child:
-            collect_constant_strings_target(xml.child, attribute_keys, tags)
+            collect_constant_strings_target(xml.child, attribute_keys, input_strings, attribute_values, tags)
     
-    # extract unique attribute keys and tags from input
+    # extract unique attribute keys and tags from input, and the strings of each example's input
     attribute_keys = set()
+    input_strings = [set() for _ in input_outputs]
+    attribute_values = set()
     tags = set()
-    for inputs, _ in input_outputs:
+    for (inputs, _), example_strings in zip(input_outputs, input_strings):
         for value in inputs.values():
             if isinstance(value, XMLTag):
-                collect_constant_strings_env(value, attribute_keys, tags)
+                collect_constant_strings_env(value, attribute_keys, example_strings, tags)
 
     # extract unique attribute keys, values, and tags from output
-    for _, output in input_outputs:
+    for (_, output), example_strings in zip(input_outputs, input_strings):
         if isinstance(output, XMLTag):
-            collect_constant_strings_target(output, attribute_keys, tags)
+            collect_constant_strings_target(output, attribute_keys, example_strings, attribute_values, tags)
 
     # create terminals for extracted keys, values, and tags
-    attribute_terminals = [ConstantString(key_or_value) for key_or_value in attribute_keys]
-    tag_terminals = [ConstantString(tag) for tag in tags]
-
-    # init expressions by size and type
-    expr_by_size_and_type = {}
+    attribute_terminals = [ConstantString(key, "key") for key in sorted(attribute_keys)] + [ConstantString(value, "value") for value in sorted(attribute_values)]
+    tag_terminals = [ConstantString(tag, "tag") for tag in sorted(tags)]
 
     # init with vars and terminals
-    terminals = variables + attribute_terminals + tag_terminals
-    
-    for expr in terminals:
-        t = expr.return_type
-        if (t, 1) not in expr_by_size_and_type:
-            expr_by_size_and_type[(t, 1)] = set()
-        expr_by_size_and_type[(t, 1)].add(expr)
+    return variables + attribute_terminals + tag_terminals
 
-    observational_equivalence = {}
+def production_cost(costs, production):
+    """
+    Cost of an operator or terminal class; 1 unless `costs` says otherwise.
+    """
+    return 1 if costs is None else costs.get(production, 1)
+
+def level_jobs(bank, operators, size, costs=None):
+    """
+    Lists the (operator id, argument (type, size) keys) pairs that build programs of `size` from the rows in `bank`,
+    in enumeration order. A string argument of some sort is filled by constants of that sort or by extracted
+    strings (see `accepted_types`), which are separate jobs. Keys that have no rows in the bank are skipped.
+    With `costs`, sizes are total costs, and the operator's own cost replaces its +1.
+    """
+    jobs = []
+    for operator in operators:
+        operator_id = bank.operator_id(operator)
+        for partition in integer_partitions(size - production_cost(costs, operator), len(operator.argument_types)):
+            # collect args matching the operator's types and size partitions
+            alternatives = [[(argument_type, argument_size) for argument_type in accepted_types(operator_type)
+                             if (argument_type, argument_size) in bank.by_size_and_type]
+                            for operator_type, argument_size in zip(operator.argument_types, partition)]
+            for keys in itertools.product(*alternatives):
+                jobs.append((operator_id, keys))
+    return jobs
+
+def level_task_width(bank, keys):
+    """
+    Number of candidates enumerated per row of the first argument.
+    """
+    width = 1
+    for key in keys[1:]:
+        width *= len(bank.by_size_and_type[key])
+    return width
 
-    for size in range(2, global_bound + 1):
-        for operator in operators:  
-            arity = len(operator.argument_types)
-            partitions = integer_partitions(size - 1, arity)
-
-            for partition in partitions:
-                argument_combinations = []
-
-                # collect args matching the operator's types and size partitions
-                for arg_size, arg_type in zip(partition, operator.argument_types):
-                    if (arg_type, arg_size) in expr_by_size_and_type:
-                        argument_combinations.append(list(expr_by_size_and_type[(arg_type, arg_size)]))
-                    else:
-                        break
-                else:
-                    # gen combinations of arguments for the operator
-                    for args in itertools.product(*argument_combinations):
-                        expr = operator(*args)
-                        
-                        # eval the expression on inputs
-                        outputs = tuple(json.dumps(expr.evaluate(input), default=lambda x: x.content if isinstance(x, ConstantString) else x, sort_keys=True) for input, _ in input_outputs)
-                        # add only unique outputs
-                        if outputs not in observational_equivalence:
-                            observational_equivalence[outputs] = expr
-                            t = expr.return_type
-                            if (t, size) not in expr_by_size_and_type:
-                                expr_by_size_and_type[(t, size)] = set()
-                            expr_by_size_and_type[(t, size)].add(expr)
-                            yield expr
-    
 def integer_partitions(target_value, number_of_arguments):
     """
     Returns all ways of summing up to `target_value` by adding `number_of_arguments` nonnegative integers
@@ -143,36 +449,92 @@ def integer_partitions(target_value, number_of_arguments):
              for x1 in range(target_value + 1)
              for x2s in integer_partitions(target_value - x1, number_of_arguments - 1) ]
 
-def bottom_up_xml(global_bound, operators, input_outputs):
+def bottom_up_xml(global_bound, operators, input_outputs, columnar=False, memo=None, workers=None, coordinator=None, checkpoint=None, cache=None, costs=None, symmetry=None, reachability=None, parallel_threshold=default_parallel_threshold):
     """
     global_bound: int. Upper bound on expression size.
     operators: List of operator classes for XML.
     constants: List of constant XML expressions.
     input_outputs: List of input-output XML pairs.
+    columnar: bool. Decide observational equivalence with the NumPy-backed `ColumnarEquivalence` table.
+    memo: ApplicationMemo or None. Memoizes operator applications; its counters report the hit rate.
+    workers: int or None. Number of processes used to enumerate each size level.
+    coordinator: Coordinator or None. Enumerates each size level on remote workers (see distributed.py).
+    checkpoint: str or None. Directory where the enumeration is checkpointed after every size level and resumed from.
+    cache: ResultCache or None. Returns the stored result of an equivalent task, and stores new results (see result_cache.py).
+    costs: dict or None. Production costs that order the enumeration (see pcfg.py); global_bound then bounds the cost.
+    symmetry: SymmetryBreaker or None. Skips candidates that rewrite rules prove redundant; it counts the skipped evaluations.
+    reachability: ReachabilityPruner or None. Discards programs that cannot reach the target within global_bound; it counts them.
+    parallel_threshold: int. Number of candidates below which a level is enumerated in-process despite `workers` or `coordinator`.
     """
-    target_outputs = tuple(json.dumps(output.evaluate({}), sort_keys=True) for _, output in input_outputs)
+    if cache is not None:
+        # options that can change the program or the count; the memo and the workers change neither
+        options = {"columnar": columnar, "reachability": reachability is not None,
+                   "symmetry": None if symmetry is None else [rule.name for rule in symmetry.rules]}
+        cached = cache.get(global_bound, operators, input_outputs, costs, options)
+        if cached is not None:
+            return cached
+
+    target_outputs = tuple(output.evaluate({}) for _, output in input_outputs)
     # print(target_outputs)
 
-    expression_count = 0  
+    program, expression_count = None, 0
+    bank = ProgramBank()
 
     # with open("outputs.txt", "w") as o_file: # for debugging
     #     with open("programs.txt", "w") as p_file:
-    for expr in bottom_up_generator(global_bound, operators, input_outputs):
-        # p_file.write(f"{expr}\n")
+    for row, outputs in bottom_up_generator(global_bound, operators, input_outputs, bank, columnar, memo, workers, coordinator, checkpoint, costs=costs, symmetry=symmetry, reachability=reachability, parallel_threshold=parallel_threshold):
+        # p_file.write(f"{bank.expression(row)}\n")
         expression_count += 1 
-        outputs = tuple(json.dumps(expr.evaluate(input), sort_keys=True) for input, _ in input_outputs)
         # o_file.write(f"{outputs}\n")
+        # the outputs were computed by the generator; comparing interned values is identity per example
         if outputs == target_outputs:
-            return expr, expression_count
-    return None, expression_count
+            # only the winning program is rebuilt as an Expression
+            program = bank.expression(row)
+            break
 
-def test_bottom_up_xml(verbose=False):
-    
-    operators = [
-        ExtractTag, ExtractAttribute, ExtractText, ExtractChild,
-        SetTag, SetAttribute, SetText, SetChild,
-        RemoveAttribute, RemoveChild, RemoveText 
-    ]
+    if cache is not None:
+        cache.put(global_bound, operators, input_outputs, program, expression_count, costs, options)
+    return program, expression_count
+
+def bottom_up_xml_batch(global_bound, operators, tasks, columnar=False, memo=None, workers=None, coordinator=None):
+    """
+    Synthesizes a program for each of `tasks`, lists of input-output XML pairs that share the same inputs
+    and differ only in their outputs, with a single enumeration. Constants are harvested from every task,
+    and each generated program is looked up in an index from target outputs to the unsolved tasks.
+    Returns a (program, expression count) pair per task, where the count is the number of programs
+    generated when the task was solved. Raises ValueError if there is no task or the inputs differ.
+    """
+    if not tasks:
+        raise ValueError("no tasks to synthesize")
+    input_outputs = tasks[0]
+    for task in tasks:
+        if [inputs for inputs, _ in task] != [inputs for inputs, _ in input_outputs]:
+            raise ValueError("batched tasks must share their inputs")
+
+    # target outputs -> indices of the tasks still waiting for them
+    unsolved = {}
+    for index, task in enumerate(tasks):
+        unsolved.setdefault(tuple(output.evaluate({}) for _, output in task), []).append(index)
+    results = [(None, 0)] * len(tasks)
+
+    terminals = make_terminals([pair for task in tasks for pair in task])
+    expression_count = 0
+    bank = ProgramBank()
+    for row, outputs in bottom_up_generator(global_bound, operators, input_outputs, bank, columnar, memo, workers, coordinator, terminals=terminals):
+        expression_count += 1
+        solved = unsolved.pop(outputs, None)
+        if solved is not None:
+            program = bank.expression(row)
+            for index in solved:
+                results[index] = (program, expression_count)
+            if not unsolved:
+                break
+    for indices in unsolved.values():
+        for index in indices:
+            results[index] = (None, expression_count)
+    return results
+
+def test_bottom_up_xml(verbose=False, compiled=False, columnar=False, memoize=False, workers=None, coordinator=None, checkpoint=None, cache=None, library_corpus=None, symmetry=False):
     
     test_cases = []
 
@@ -188,6 +550,11 @@ def test_bottom_up_xml(verbose=False):
     test_cases.append((test_case_10, 10))
     # test_cases.append((test_case_11, 11))
     # test_cases.append((test_case_12, 12))
+    # strings extracted from the input move across sorts
+    test_cases.append((test_case_13, 13))
+    test_cases.append((test_case_14, 14))
+    # a missing text is copied as None, which SetText turns into a text removal
+    test_cases.append((test_case_15, 15))
     
     # Points for each test case
     how_many_points = [1] * len(test_cases)
@@ -263,17 +630,28 @@ def test_bottom_up_xml(verbose=False):
 
         # run bottom-up generator
         start_time = time.time()
-        program, expression_count = bottom_up_xml(optimal_size, operators, test_case)
+        memo = ApplicationMemo() if memoize else None
+        symmetry_breaker = SymmetryBreaker() if symmetry else None
+        case_checkpoint = os.path.join(checkpoint, f"test_case_{case_number}") if checkpoint is not None else None
+        case_operators = operators
+        if library_corpus is not None:
+            # the corpus lists the solutions of test cases 1-10 in order; the case's own one is left out
+            from library_learning import learn_library
+            case_operators = operators + learn_library(library_corpus[:case_number - 1] + library_corpus[case_number:])
+        program, expression_count = bottom_up_xml(optimal_size, case_operators, test_case, columnar, memo, workers, coordinator, case_checkpoint, cache, symmetry=symmetry_breaker)
         if program is None:
             print(f"Failed to synthesize a program.")
             continue
 
         # eval the program and validate it
         fails_test_case = False
+        # only the check of the synthesized program is compiled; the enumeration never evaluates expressions
+        evaluate = program.compile() if compiled else program.evaluate
         for inputs, expected_output in test_case:
-            output = program.evaluate(inputs)
+            output = evaluate(inputs)
             if output != expected_output.evaluate({}):
-                print(f"Program failed for input {inputs}.\nExpected:\n{xml_to_pretty_string(expected_output)}\nGot:\n{xml_to_pretty_string(output)}")
+                got = xml_to_pretty_string(output.to_xml_tag()) if isinstance(output, XMLValue) else repr(output)
+                print(f"Program failed for input {inputs}.\nExpected:\n{xml_to_pretty_string(expected_output)}\nGot:\n{got}")
                 fails_test_case = True
             else:
                 print(f"Test case passed!")
@@ -283,14 +661,87 @@ def test_bottom_up_xml(verbose=False):
 
         # prettify and display the synthesized program
         print(f"Number of programs generated: {expression_count}\n")
+        if memo is not None:
+            print(f"Operator memo: {memo.hits} hits, {memo.misses} misses ({memo.hit_rate:.1%} hit rate)\n")
+        if symmetry_breaker is not None:
+            print(f"Symmetry breaking: {symmetry_breaker.total_skipped} evaluations skipped\n")
         print(f"Synthesized program:\n{prettify_expression(program)}\n")
         print(f"Execution time: {time.time() - start_time:.4f} seconds")
 
         total_points += pt
 
+    if cache is not None:
+        print(f"Result cache: {cache.hits} hits, {cache.misses} misses")
     print("=" * 50)
     print(f"[+] XML Bottom-Up Synthesis: +{total_points}/{sum(how_many_points)} points")
     return total_points
 
+def test_bottom_up_xml_batch():
+    """
+    Solves several conversions of the same `packagedElement` with one batched enumeration
+    and compares the number of generated programs with solving them one at a time.
+    """
+    source = '<packagedElement name="TempClass1" visibility="public"></packagedElement>'
+    variants = [
+        '<packagedElement name="TempClass1"></packagedElement>',
+        '<packagedElement visibility="public"></packagedElement>',
+        '<packagedElement></packagedElement>',
+        '<ownedAttribute name="TempClass1" visibility="public"></ownedAttribute>',
+        '<packagedElement name="TempClass1" visibility="public">TempClass1</packagedElement>',
+        '<ownedAttribute name="TempClass1"></ownedAttribute>',
+    ]
+    tasks = [[({"input": xml_to_dsl(source)}, xml_to_dsl(variant))] for variant in variants]
+
+    start_time = time.time()
+    results = bottom_up_xml_batch(20, operators, tasks)
+    batch_time = time.time() - start_time
+
+    total_points = 0
+    for task, (program, _) in zip(tasks, results):
+        if solves(program, task):
+            total_points += 1
+        else:
+            print(f"Failed to synthesize {task[0][1]}")
+
+    start_time = time.time()
+    separate_count = sum(bottom_up_xml(20, operators, task)[1] for task in tasks)
+    separate_time = time.time() - start_time
+
+    print(f"Batched: {max(count for _, count in results)} programs generated in {batch_time:.4f} seconds")
+    print(f"Separate: {separate_count} programs generated in {separate_time:.4f} seconds")
+    print(f"[+] XML Bottom-Up Batch Synthesis: +{total_points}/{len(tasks)} points")
+    return total_points
+
 if __name__ == "__main__":
-    test_bottom_up_xml(verbose=True)
\ No newline at end of file
+    if "--batch" in sys.argv:
+        test_bottom_up_xml_batch()
+        sys.exit()
+    workers = int(sys.argv[sys.argv.index("--workers") + 1]) if "--workers" in sys.argv else None
+    coordinator = None
+    if "--remote" in sys.argv:
+        # --remote HOST:PORT,HOST:PORT,... connects to running workers, --remote N starts N local ones
+        from distributed import Coordinator, start_local_workers, read_authkey, authkey_variable
+        remote = sys.argv[sys.argv.index("--remote") + 1]
+        if remote.isdigit():
+            # local workers share a fresh random key
+            authkey = os.urandom(32)
+            _, addresses = start_local_workers(int(remote), authkey)
+        else:
+            authkey = read_authkey(sys.argv)
+            if authkey is None:
+                sys.exit(f"error: give the workers' authentication key with --authkey or {authkey_variable}")
+            addresses = [(host, int(port)) for host, port in (address.rsplit(":", 1) for address in remote.split(","))]
+        coordinator = Coordinator(addresses, authkey)
+    checkpoint = sys.argv[sys.argv.index("--checkpoint") + 1] if "--checkpoint" in sys.argv else None
+    cache = None
+    if "--cache" in sys.argv:
+        from result_cache import ResultCache
+        cache = ResultCache(sys.argv[sys.argv.index("--cache") + 1])
+    library_corpus = None
+    if "--library" in sys.argv:
+        # operators learned from the programs listed in corpus.txt (see library_learning.py)
+        from pcfg import default_corpus, read_corpus
+        library_corpus = read_corpus(default_corpus)
+    test_bottom_up_xml(verbose=True, compiled="--compiled" in sys.argv, columnar="--columnar" in sys.argv, memoize="--memo" in sys.argv, workers=workers, coordinator=coordinator, checkpoint=checkpoint, cache=cache, library_corpus=library_corpus, symmetry="--symmetry" in sys.argv)
+    if coordinator is not None:
+        coordinator.close()
\ No newline at end of file
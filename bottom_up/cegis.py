@@ -0,0 +1,106 @@
+import random
+import sys
+import os
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from dsl import *
+from test_cases import *
+from harness import run_harness
+from bottom_up import bottom_up_xml
+from parallel import fork_map
+
+def first_failure(program, inputs, targets, indexes):
+    """
+    Returns the first of `indexes` on which the compiled `program` is wrong, or None.
+    """
+    for index in indexes:
+        if program(inputs[index]) != targets[index]:
+            return index
+    return None
+
+def find_counterexample(program, inputs, targets, workers=None, chunk_size=64):
+    """
+    Returns the index of the first example of the corpus on which `program` is wrong, or None if it is correct.
+    With `workers`, chunks of the corpus are checked on forked processes (see `fork_map`); results are read in
+    corpus order, and the pending chunks are cancelled as soon as one has a counterexample.
+    """
+    compiled = program.compile()
+    if workers is None:
+        return first_failure(compiled, inputs, targets, range(len(inputs)))
+    chunks = [range(start, min(start + chunk_size, len(inputs))) for start in range(0, len(inputs), chunk_size)]
+    failures = fork_map(first_failure, (compiled, inputs, targets), chunks, workers)
+    try:
+        return next((failure for failure in failures if failure is not None), None)
+    finally:
+        failures.close()
+
+def cegis_xml(global_bound, operators, input_outputs, initial=1, workers=None):
+    """
+    Counterexample-guided synthesis over a large corpus of input-output XML pairs: `bottom_up_xml` only sees
+    a working subset, which starts with the first `initial` pairs, so every candidate is evaluated on that
+    subset alone. The synthesized program is checked against the whole corpus (see `find_counterexample`),
+    and the first counterexample joins the working subset before synthesizing again. Synthesis restarts from
+    scratch, since the counterexample may bring constants that the enumeration has not harvested.
+    Returns (program, number of programs generated over all rounds, working subset).
+    """
+    inputs = [inputs for inputs, _ in input_outputs]
+    targets = [output.evaluate({}) for _, output in input_outputs]
+    working = list(input_outputs[:initial])
+    expression_count = 0
+    while True:
+        program, count = bottom_up_xml(global_bound, operators, working)
+        expression_count += count
+        if program is None:
+            return None, expression_count, working
+        counterexample = find_counterexample(program, inputs, targets, workers)
+        if counterexample is None:
+            return program, expression_count, working
+        working.append(input_outputs[counterexample])
+
+def make_corpus(kind, size, seed=0):
+    """
+    Generates `size` examples of one of the test case transformations with random names and texts:
+    "visibility" sets visibility="public" on a packagedElement (test cases 2, 7 and 8; a third of the elements
+    are already public, and another third private), and "comment" moves the body of an ownedComment into an
+    attribute (test cases 3 and 9).
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        name = f"TempClass{rng.randrange(10000)}"
+        identifier = f"_{rng.randrange(16**4):04X}"
+        if kind == "visibility":
+            visibility = rng.choice(["", ' visibility="private"', ' visibility="public"'])
+            input_xml = f'<packagedElement id="{identifier}" name="{name}"{visibility}></packagedElement>'
+            output_xml = f'<packagedElement id="{identifier}" name="{name}" visibility="public"></packagedElement>'
+        else:
+            body = f"This is body {rng.randrange(16**8):08x}."
+            input_xml = f'<ownedComment id="{identifier}"><body>{body}</body></ownedComment>'
+            output_xml = f'<ownedComment id="{identifier}" body="{body}" />'
+        corpus.append(({"input": xml_to_dsl(input_xml)}, xml_to_dsl(output_xml)))
+    return corpus
+
+def test_cegis(size=300):
+    """
+    Compares CEGIS with synthesis on the whole corpus, on generated corpora of `size` examples. Each corpus
+    starts with an example that the transformation leaves unchanged, if it has one, so that the first round
+    finds a program that does nothing and the second one learns from a counterexample.
+    """
+
+    def run(kind, corpus):
+        corpus.sort(key=lambda example: example[0]["input"] is not example[1])
+        start_time = time.time()
+        program, count, working = cegis_xml(20, operators, corpus)
+        cegis_time = time.time() - start_time
+        start_time = time.time()
+        corpus_program, _ = bottom_up_xml(20, operators, corpus)
+        corpus_time = time.time() - start_time
+        # the same counterexamples are found when verifying in parallel
+        parallel_program, _, parallel_working = cegis_xml(20, operators, corpus, workers=2)
+        solved = solves(program, corpus) and program is parallel_program and working == parallel_working
+        yield solved, (kind, len(corpus), len(working), count, cegis_time, corpus_time, program)
+    return run_harness("CEGIS Synthesis", ["corpus", "examples", "working", "programs", "time (s)", "corpus", "program"], run,
+                       [(kind, make_corpus(kind, size)) for kind in ["visibility", "comment"]])
+
+if __name__ == "__main__":
+    test_cegis()
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+from array import array
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from dsl import *
+
+# On-disk layout of a checkpoint directory:
+#   meta.json         task fingerprint, last completed size, row count, type names, column typecodes
+#   <column>.bin      the ProgramBank columns as raw native-endian arrays
+#   output_ids.bin    int64 matrix (rows x examples) of ids into values.pickle
+#   values.pickle     distinct output values, in id order
+#   terminals.pickle  leaf expressions, in terminal order
+#   operators.pickle  operator classes, in operator id order
+# A save writes <directory>.tmp and renames it into place, moving the previous checkpoint to <directory>.old
+# in between; `load_checkpoint` falls back to <directory>.old if a save stopped between the two renames.
+checkpoint_format = 5
+columns = ["operator_ids", "child_starts", "child_ids", "sizes", "types"]
+
+def task_fingerprint(operators, input_outputs, costs=None):
+    """
+    Canonical hash of a synthesis task: the operator names (with the pattern of learned macros, since libraries
+    reuse names), the evaluated (input, output) values, and the production costs if any.
+    Values are interned with sorted attributes, so whitespace and attribute order in the source XML do not matter.
+    """
+    examples = [(sorted((name, repr(value.evaluate({}))) for name, value in inputs.items()), repr(output.evaluate({})))
+                for inputs, output in input_outputs]
+    names = [operator.__name__ if getattr(operator, "definition", None) is None else f"{operator.__name__}={operator.definition}"
+             for operator in operators]
+    text = repr((names, examples))
+    if costs is not None:
+        text += repr(sorted((production.__name__, cost) for production, cost in costs.items()))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def save_checkpoint(directory, fingerprint, bank, completed_size):
+    """
+    Writes `bank` after enumerating every size up to `completed_size`. Each step of replacing the previous
+    checkpoint is an atomic rename, so an interrupted save leaves either checkpoint readable by `load_checkpoint`.
+    """
+    temporary = directory.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+
+    for name in columns:
+        with open(os.path.join(temporary, f"{name}.bin"), "wb") as file:
+            getattr(bank, name).tofile(file)
+
+    value_store = ValueStore()
+    output_ids = array('q', (value_store.id(value) for outputs in bank.outputs for value in outputs))
+    with open(os.path.join(temporary, "output_ids.bin"), "wb") as file:
+        output_ids.tofile(file)
+    for name, content in [("values", value_store.values), ("terminals", bank.terminals), ("operators", bank.operators)]:
+        with open(os.path.join(temporary, f"{name}.pickle"), "wb") as file:
+            pickle.dump(content, file)
+
+    meta = {
+        "format": checkpoint_format,
+        "task": fingerprint,
+        "completed_size": completed_size,
+        "rows": len(bank),
+        "examples": len(bank.outputs[0]) if bank.outputs else 0,
+        "type_names": bank.type_names,
+        "typecodes": {name: getattr(bank, name).typecode for name in columns},
+    }
+    with open(os.path.join(temporary, "meta.json"), "w") as file:
+        json.dump(meta, file)
+
+    previous = directory.rstrip(os.sep) + ".old"
+    if os.path.isdir(directory):
+        shutil.rmtree(previous, ignore_errors=True)
+        os.replace(directory, previous)
+    os.replace(temporary, directory)
+    shutil.rmtree(previous, ignore_errors=True)
+
+def load_checkpoint(directory, fingerprint, bank):
+    """
+    Restores the checkpoint in `directory` into the empty `bank` if it was saved for the same task.
+    If a save was interrupted after moving the checkpoint aside, the previous one is restored instead.
+    Returns the last completed size, or None if there is no usable checkpoint.
+    """
+    meta_path = os.path.join(directory, "meta.json")
+    if not os.path.exists(meta_path):
+        directory = directory.rstrip(os.sep) + ".old"
+        meta_path = os.path.join(directory, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+    with open(meta_path) as file:
+        meta = json.load(file)
+    if meta["format"] != checkpoint_format or meta["task"] != fingerprint:
+        return None
+
+    for name in columns:
+        column = array(meta["typecodes"][name])
+        with open(os.path.join(directory, f"{name}.bin"), "rb") as file:
+            column.fromfile(file, os.path.getsize(file.name) // column.itemsize)
+        setattr(bank, name, column)
+    for name in ["values", "terminals", "operators"]:
+        with open(os.path.join(directory, f"{name}.pickle"), "rb") as file:
+            meta[name] = pickle.load(file)
+    bank.terminals = meta["terminals"]
+    bank.operators = meta["operators"]
+    bank.type_names = meta["type_names"]
+
+    values, examples = meta["values"], meta["examples"]
+    if meta["rows"] and examples:
+        output_ids = array('q')
+        with open(os.path.join(directory, "output_ids.bin"), "rb") as file:
+            output_ids.fromfile(file, meta["rows"] * examples)
+        bank.outputs = [tuple(values[value_id] for value_id in output_ids[row * examples:(row + 1) * examples])
+                        for row in range(meta["rows"])]
+    else:
+        bank.outputs = [() for _ in range(meta["rows"])]
+
+    bank.by_size_and_type = {}
+    for row in range(meta["rows"]):
+        key = (bank.type_names[bank.types[row]], bank.sizes[row])
+        if key not in bank.by_size_and_type:
+            bank.by_size_and_type[key] = array('q')
+        bank.by_size_and_type[key].append(row)
+    return meta["completed_size"]
+
+def test_checkpoint(test_case=None, bound=6, resumed_bound=9):
+    """
+    Checks on `test_case` (test case 5 by default) that an enumeration checkpointed up to `bound` and resumed up to
+    `resumed_bound` yields the same programs and outputs as an uninterrupted run, that a leftover .tmp directory is
+    ignored, that a checkpoint moved to .old by an interrupted save is recovered, and that a checkpoint of another
+    task or format is rejected.
+    """
+    # bottom_up.py imports this module
+    from bottom_up import ProgramBank, bottom_up_generator
+    from harness import run_harness
+    from test_cases import test_case_5
+    if test_case is None:
+        test_case = test_case_5
+    fingerprint = task_fingerprint(operators, test_case)
+
+    def enumerate_programs(global_bound, checkpoint=None):
+        bank = ProgramBank()
+        return [(str(bank.expression(row)), outputs)
+                for row, outputs in bottom_up_generator(global_bound, operators, test_case, bank, checkpoint=checkpoint)]
+
+    def completed_size(directory):
+        return load_checkpoint(directory, fingerprint, ProgramBank())
+
+    uninterrupted = enumerate_programs(resumed_bound)
+
+    def check_resume(directory):
+        first = enumerate_programs(bound, directory)
+        if first != uninterrupted[:len(first)] or completed_size(directory) != bound:
+            return False
+        return enumerate_programs(resumed_bound, directory) == uninterrupted and completed_size(directory) == resumed_bound
+
+    def check_leftover_temporary(directory):
+        enumerate_programs(bound, directory)
+        # a save that stopped while writing <directory>.tmp
+        os.makedirs(directory + ".tmp")
+        with open(os.path.join(directory + ".tmp", "meta.json"), "w") as file:
+            file.write("{")
+        return completed_size(directory) == bound and enumerate_programs(resumed_bound, directory) == uninterrupted
+
+    def check_previous_recovered(directory):
+        enumerate_programs(bound, directory)
+        # a save that stopped between moving the checkpoint aside and renaming the new one into place
+        os.replace(directory, directory + ".old")
+        return completed_size(directory) == bound and enumerate_programs(resumed_bound, directory) == uninterrupted
+
+    def check_other_task_rejected(directory):
+        enumerate_programs(bound, directory)
+        return completed_size(directory) == bound and load_checkpoint(directory, task_fingerprint(operators[:-1], test_case), ProgramBank()) is None
+
+    def check_other_format_rejected(directory):
+        enumerate_programs(bound, directory)
+        if completed_size(directory) != bound:
+            return False
+        meta_path = os.path.join(directory, "meta.json")
+        with open(meta_path) as file:
+            meta = json.load(file)
+        meta["format"] = checkpoint_format - 1
+        with open(meta_path, "w") as file:
+            json.dump(meta, file)
+        return completed_size(directory) is None
+
+    def run(name, check):
+        root = tempfile.mkdtemp()
+        try:
+            passed = check(os.path.join(root, "checkpoint"))
+        finally:
+            shutil.rmtree(root)
+        yield passed, (name, "yes" if passed else "no")
+    checks = [("resume", check_resume), ("stale .tmp", check_leftover_temporary), ("from .old", check_previous_recovered),
+              ("other task", check_other_task_rejected), ("old format", check_other_format_rejected)]
+    return run_harness("Checkpoints", ["check", "passed"], run, checks)
+
+if __name__ == "__main__":
+    test_checkpoint()
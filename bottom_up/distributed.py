@@ -0,0 +1,186 @@
+import multiprocessing
+import sys
+import os
+import time
+from multiprocessing.connection import Client, Listener, wait
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from dsl import *
+from parallel import enumerate_shard
+
+# environment variable holding the shared secret that authenticates coordinator <-> worker connections.
+# Workers unpickle what they receive, so anyone with the key can run code on them: there is no default key.
+authkey_variable = "SYNTHESIS_AUTHKEY"
+
+class WorkerBank():
+    """
+    Replica of the coordinator's `ProgramBank` kept by a worker. Only the columns that
+    `enumerate_shard` reads are mirrored: operators, outputs and the (type, size) index.
+    """
+
+    def __init__(self, operators):
+        self.operators = operators
+        self.outputs = []
+        self.by_size_and_type = {}
+
+    def add_row(self, type_name, size, outputs):
+        self.by_size_and_type.setdefault((type_name, size), []).append(len(self.outputs))
+        self.outputs.append(outputs)
+
+def read_authkey(argv):
+    """
+    Returns the shared secret given with `--authkey KEY` in `argv`, or else in the SYNTHESIS_AUTHKEY environment variable, or None.
+    """
+    if "--authkey" in argv:
+        authkey = argv[argv.index("--authkey") + 1]
+    else:
+        authkey = os.environ.get(authkey_variable)
+    return authkey.encode() if authkey else None
+
+def serve_worker(address, authkey, ready=None):
+    """
+    Runs an enumeration worker that accepts one coordinator connection on `address` and serves it until closed.
+    Only a coordinator with the same `authkey` can connect.
+    Messages are ("init", operators), ("rows", rows), ("task", task) and ("close",).
+    If `ready` is given, the bound address is sent through it once the worker is listening.
+    """
+    if not authkey:
+        raise ValueError("a worker needs an authentication key")
+    with Listener(address, authkey=authkey) as listener:
+        if ready is not None:
+            ready.send(listener.address)
+        with listener.accept() as connection:
+            bank, observational_equivalence = None, set()
+            while True:
+                message = connection.recv()
+                if message[0] == "init":
+                    bank, observational_equivalence = WorkerBank(message[1]), set()
+                elif message[0] == "rows":
+                    for type_name, size, outputs, is_terminal in message[1]:
+                        bank.add_row(type_name, size, outputs)
+                        # terminals are not part of the coordinator's equivalence table
+                        if not is_terminal:
+                            observational_equivalence.add(outputs)
+                elif message[0] == "task":
+                    connection.send(enumerate_shard(bank, observational_equivalence, message[1]))
+                elif message[0] == "close":
+                    return
+
+def _serve_local_worker(authkey, ready):
+    serve_worker(("127.0.0.1", 0), authkey, ready)
+
+def start_local_workers(count, authkey):
+    """
+    Starts `count` worker processes listening on free localhost ports, with the key `authkey`.
+    Returns the processes and their addresses.
+    """
+    processes, addresses = [], []
+    for _ in range(count):
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(target=_serve_local_worker, args=(authkey, sender), daemon=True)
+        process.start()
+        processes.append(process)
+        addresses.append(receiver.recv())
+    return processes, addresses
+
+class Coordinator():
+    """
+    Coordinator side of distributed enumeration. The coordinator owns the bank and the global
+    observational-equivalence table (both live in `bottom_up_generator`); between size levels it
+    broadcasts the rows accepted since the last level, then hands out tasks to idle workers and
+    returns their results in task order.
+    """
+
+    def __init__(self, addresses, authkey):
+        self.connections = [Client(address, authkey=authkey) for address in addresses]
+        self.bank = None
+        self.synced_rows = 0
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(("close",))
+            connection.close()
+        self.connections = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _sync(self, bank):
+        if bank is not self.bank:
+            # new synthesis task
+            self.bank, self.synced_rows = bank, 0
+            for connection in self.connections:
+                connection.send(("init", bank.operators))
+        rows = [(bank.type_names[bank.types[row]], bank.sizes[row], bank.outputs[row], bank.operator_ids[row] < 0)
+                for row in range(self.synced_rows, len(bank))]
+        for connection in self.connections:
+            connection.send(("rows", rows))
+        self.synced_rows = len(bank)
+
+    def run_level(self, bank, tasks):
+        """
+        Enumerates `tasks` on the workers. Yields the result of each task in task order.
+        """
+        self._sync(bank)
+        pending = iter(enumerate(tasks))
+        busy, results = {}, {}
+
+        def dispatch(connection):
+            for index, task in pending:
+                connection.send(("task", task))
+                busy[connection] = index
+                return
+
+        for connection in self.connections:
+            dispatch(connection)
+        try:
+            for index in range(len(tasks)):
+                while index not in results:
+                    for connection in wait(list(busy)):
+                        results[busy.pop(connection)] = connection.recv()
+                        dispatch(connection)
+                yield results.pop(index)
+        finally:
+            # drain tasks still running if the caller stopped early
+            for connection in list(busy):
+                connection.recv()
+
+def test_distributed(workers=2):
+    """
+    Starts `workers` local worker processes and runs test cases 1-10 on them with the parallel threshold
+    set to 0, so that every size level is sent to the workers, and checks that the programs and counts
+    match the sequential run.
+    """
+    # bottom_up.py imports parallel.py, which this module imports
+    from bottom_up import bottom_up_xml
+    from harness import run_harness
+
+    # local workers share a fresh random key
+    authkey = os.urandom(32)
+    _, addresses = start_local_workers(workers, authkey)
+    with Coordinator(addresses, authkey) as coordinator:
+        def run(case_number, test_case):
+            start_time = time.time()
+            program, count = bottom_up_xml(20, operators, test_case)
+            sequential_time = time.time() - start_time
+            start_time = time.time()
+            remote_program, remote_count = bottom_up_xml(20, operators, test_case, coordinator=coordinator, parallel_threshold=0)
+            remote_time = time.time() - start_time
+            matches = solves(remote_program, test_case) and str(remote_program) == str(program) and remote_count == count
+            yield matches, (case_number, count, remote_count, sequential_time, remote_time, remote_program)
+        return run_harness("Distributed Enumeration", ["test case", "programs", "remote", "time (s)", "remote", "program"], run)
+
+if __name__ == "__main__":
+    if "--serve" not in sys.argv:
+        test_distributed()
+        sys.exit()
+    # python3 bottom_up/distributed.py --serve [HOST:]PORT [--authkey KEY]
+    # the worker listens on 127.0.0.1 unless a host is given
+    authkey = read_authkey(sys.argv)
+    if authkey is None:
+        sys.exit(f"error: give the authentication key with --authkey or {authkey_variable}")
+    address = sys.argv[sys.argv.index("--serve") + 1]
+    host, port = address.rsplit(":", 1) if ":" in address else ("127.0.0.1", address)
+    serve_worker((host, int(port)), authkey)
@@ -0,0 +1,43 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from test_cases import base_test_cases
+
+def format_row(columns, values):
+    # times are floats; a column named "program" (or "... program") comes last and is not padded
+    fields = []
+    for column, value in zip(columns, values):
+        if column.endswith("program"):
+            fields.append(f" {value}")
+        elif isinstance(value, float):
+            fields.append(f"{value:>10.4f}")
+        else:
+            fields.append(f"{value:>10}")
+    return " ".join(fields)
+
+def harness_table(columns, run, cases=None):
+    """
+    Shared driver of the module harnesses. Calls run(label, case) for every (label, case) pair of `cases`
+    (test cases 1-10, labelled with their number, by default) and prints a table of `columns` with a row
+    for every (solved, row) pair it yields. Returns (points, possible points); rows whose `solved` is None
+    are not scored.
+    """
+    print(format_row(columns, columns))
+    points = possible = 0
+    for label, case in enumerate(base_test_cases, 1) if cases is None else cases:
+        for solved, row in run(label, case):
+            print(format_row(columns, row))
+            if solved is not None:
+                points += solved
+                possible += 1
+    return points, possible
+
+def report(name, points, possible):
+    print(f"[+] XML {name}: +{points}/{possible} points")
+    return points
+
+def run_harness(name, columns, run, cases=None):
+    """
+    Prints the table of `harness_table` followed by the "[+] XML <name>: +N/M points" line, and returns the points.
+    """
+    return report(name, *harness_table(columns, run, cases))
@@ -0,0 +1,190 @@
+import copyreg
+import sys
+import os
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from dsl import *
+from test_cases import *
+from harness import run_harness
+from bottom_up import bottom_up_xml
+from pcfg import default_corpus, read_corpus, terminal_classes
+
+# Patterns are nested tuples: ("hole", index, type) for a macro parameter,
+# and (operator class, argument patterns...) for an operator node.
+
+def anti_unify(first, second, holes, hole_type):
+    """
+    Least general generalization of two expressions of type `hole_type`. Operator nodes of the same class are kept
+    and everything else (leaves included, since constants are task-specific) becomes a hole.
+    The same pair of subexpressions always maps to the same hole, in `holes`.
+    """
+    if type(first) is type(second) and type(first) not in terminal_classes:
+        return (type(first),) + tuple(anti_unify(a, b, holes, argument_type)
+                                      for a, b, argument_type in zip(first.arguments(), second.arguments(), first.argument_types))
+    if (first, second) not in holes:
+        # typed by the operator's argument, since constants parsed from a log do not record their sort
+        holes[(first, second)] = ("hole", len(holes), hole_type)
+    return holes[(first, second)]
+
+def pattern_size(pattern):
+    if pattern[0] == "hole":
+        return 1
+    return 1 + sum(pattern_size(argument) for argument in pattern[1:])
+
+def pattern_string(pattern):
+    if pattern[0] == "hole":
+        return f"?{pattern[1]}"
+    return f"{pattern[0].__name__}({', '.join(pattern_string(argument) for argument in pattern[1:])})"
+
+def pattern_holes(pattern, holes=None):
+    """
+    Returns the holes of `pattern` in index order.
+    """
+    holes = {} if holes is None else holes
+    if pattern[0] == "hole":
+        holes[pattern[1]] = pattern
+    else:
+        for argument in pattern[1:]:
+            pattern_holes(argument, holes)
+    return [holes[index] for index in sorted(holes)]
+
+def match(pattern, expr, bindings):
+    """
+    Matches `expr` against `pattern`, extending `bindings` (hole index -> expression). Returns whether it matched.
+    """
+    if pattern[0] == "hole":
+        return bindings.setdefault(pattern[1], expr) is expr
+    arguments = expr.arguments()
+    return type(expr) is pattern[0] and len(arguments) == len(pattern) - 1 and all(match(p, a, bindings) for p, a in zip(pattern[1:], arguments))
+
+def subexpressions(expr):
+    yield expr
+    for argument in expr.arguments():
+        yield from subexpressions(argument)
+
+def pattern_function(pattern):
+    """
+    Returns a function from the values of the holes to the value of the pattern.
+    """
+    if pattern[0] == "hole":
+        index = pattern[1]
+        return lambda values: values[index]
+    apply = pattern[0].apply
+    arguments = [pattern_function(argument) for argument in pattern[1:]]
+
+    def evaluate(values):
+        argument_values = [argument(values) for argument in arguments]
+        # an inner operator that fails (e.g. ExtractChild of a leaf) makes the macro fail
+        if ERROR in argument_values:
+            return ERROR
+        return apply(*argument_values)
+    return evaluate
+
+class MacroOperator(HashConsed):
+    """
+    Metaclass of the macros, so that macro classes are pickled by their name and pattern (see `make_macro`).
+    """
+
+class Macro(Expression, metaclass=MacroOperator):
+    """
+    Operator learned from a corpus: applies `pattern` with its holes filled by the arguments.
+    Concrete macros are created by `make_macro`.
+    """
+    __slots__ = ("macro_arguments",)
+    pattern = None
+    # pattern_string of the pattern, which tells apart macros of different libraries with the same name
+    definition = None
+
+    def __init__(self, *macro_arguments):
+        self.macro_arguments = list(macro_arguments)
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({', '.join(str(argument) for argument in self.macro_arguments)})"
+
+    def arguments(self):
+        return self.macro_arguments
+
+    def expand(self):
+        """
+        Returns the equivalent expression over the base operators.
+        """
+        def build(pattern):
+            if pattern[0] == "hole":
+                argument = self.macro_arguments[pattern[1]]
+                return argument.expand() if isinstance(argument, Macro) else argument
+            return pattern[0](*[build(argument) for argument in pattern[1:]])
+        return build(self.pattern)
+
+# macro classes by (name, pattern), so that unpickling a macro gives back the same class
+macros = {}
+
+def make_macro(name, pattern):
+    """
+    Returns the operator class `name` that applies `pattern`. Generated classes are not reachable by name,
+    so they are pickled as a call to `make_macro`, which returns the existing class in the same process.
+    """
+    if (name, pattern) not in macros:
+        body = pattern_function(pattern)
+        macros[(name, pattern)] = MacroOperator(name, (Macro,), {
+            "__slots__": (),
+            "pattern": pattern,
+            "definition": pattern_string(pattern),
+            "return_type": pattern[0].return_type,
+            "argument_types": [hole[2] for hole in pattern_holes(pattern)],
+            "apply": staticmethod(lambda *values: body(values)),
+        })
+    return macros[(name, pattern)]
+
+def reduce_macro(macro):
+    # the base class is found by name
+    return macro.__name__ if macro.pattern is None else (make_macro, (macro.__name__, macro.pattern))
+
+copyreg.pickle(MacroOperator, reduce_macro)
+
+def learn_library(programs, size=3, minimum_uses=2):
+    """
+    Proposes patterns by anti-unifying every pair of subexpressions from different programs, and greedily
+    picks the `size` patterns that save the most nodes over the corpus: a use of a pattern replaces
+    pattern_size nodes by the macro and its distinct holes. Returns the new operator classes.
+    """
+    subtrees = [[expr for expr in set(subexpressions(program)) if type(expr) not in terminal_classes] for program in programs]
+    candidates = set()
+    for i in range(len(subtrees)):
+        for j in range(i + 1, len(subtrees)):
+            for first in subtrees[i]:
+                for second in subtrees[j]:
+                    if first.return_type == second.return_type:
+                        candidates.add(anti_unify(first, second, {}, first.return_type))
+
+    scores = {}
+    for pattern in candidates:
+        uses = sum(1 for program_subtrees in subtrees if any(match(pattern, expr, {}) for expr in program_subtrees))
+        saved = pattern_size(pattern) - 1 - len(pattern_holes(pattern))
+        if uses >= minimum_uses and saved > 0:
+            scores[pattern] = uses * saved
+
+    library = []
+    for pattern in sorted(scores, key=lambda pattern: (-scores[pattern], pattern_string(pattern)))[:size]:
+        library.append(make_macro(f"Macro{len(library)}", pattern))
+    return library
+
+def test_library_learning(corpus=default_corpus, size=3):
+    """
+    For each of test cases 1-10, learns a library from the corpus programs of the other test cases
+    (the corpus lists them in test case order) and compares the number of programs generated with and without it.
+    """
+    programs = read_corpus(corpus)
+
+    def run(case_number, test_case):
+        library = learn_library(programs[:case_number - 1] + programs[case_number:], size)
+        _, base_count = bottom_up_xml(20, operators, test_case)
+        start_time = time.time()
+        program, library_count = bottom_up_xml(20, operators + library, test_case)
+        elapsed = time.time() - start_time
+        yield solves(program, test_case), (case_number, base_count, library_count, elapsed, program)
+    return run_harness("Synthesis With Learned Library", ["test case", "base", "library", "time (s)", "program"], run)
+
+if __name__ == "__main__":
+    for macro in learn_library(read_corpus(default_corpus)):
+        print(f"{macro.__name__}: {pattern_string(macro.pattern)} -> {macro.return_type}")
+    test_library_learning()
@@ -0,0 +1,100 @@
+import itertools
+import multiprocessing
+import sys
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from dsl import ERROR, operators, solves
+
+# (function, shared arguments) of the running `fork_map`, e.g. the bank and observational equivalence table
+# at the start of the size level being enumerated. Set in the coordinating process right before the worker
+# pool is forked, so workers share the arguments copy-on-write instead of receiving them pickled with every item.
+_fork_state = None
+
+def _run_forked(item):
+    function, shared = _fork_state
+    return function(*shared, item)
+
+def fork_map(function, shared, items, workers):
+    """
+    Yields function(*shared, item) for every item, in order, computed on a pool of `workers` forked processes.
+    Only the items and the results are pickled. If the caller stops early, the pending items are cancelled.
+    """
+    global _fork_state
+    _fork_state = (function, shared)
+    executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork"))
+    try:
+        # all workers are forked on the first submission, before the caller changes any shared argument
+        yield from executor.map(_run_forked, items)
+    finally:
+        _fork_state = None
+        executor.shutdown(cancel_futures=True)
+
+def shard_tasks(bank, jobs, shard_size):
+    """
+    Splits every job (operator id, argument (type, size) keys) into tasks
+    (operator id, argument keys, start, stop) over contiguous ranges of the first argument's rows,
+    so that each task enumerates roughly `shard_size` candidates. Tasks are listed in enumeration order.
+    """
+    tasks = []
+    for operator_id, keys in jobs:
+        rows = [len(bank.by_size_and_type[key]) for key in keys]
+        per_first_row = 1
+        for count in rows[1:]:
+            per_first_row *= count
+        step = max(1, shard_size // max(1, per_first_row))
+        for start in range(0, rows[0], step):
+            tasks.append((operator_id, keys, start, min(start + step, rows[0])))
+    return tasks
+
+def enumerate_shard(bank, observational_equivalence, task):
+    """
+    Enumerates the candidates of one task and returns the (argument row ids, outputs) pairs whose outputs
+    are neither in `observational_equivalence` nor produced earlier in the same task, in enumeration order.
+    Programs that evaluate to ERROR on some example are left out.
+    """
+    operator_id, keys, start, stop = task
+    apply = bank.operators[operator_id].apply
+    bank_outputs = bank.outputs
+    argument_combinations = [bank.by_size_and_type[key] for key in keys]
+    argument_combinations[0] = argument_combinations[0][start:stop]
+
+    found, seen = [], set()
+    for args in itertools.product(*argument_combinations):
+        outputs = tuple(map(apply, *[bank_outputs[arg] for arg in args]))
+        if outputs not in observational_equivalence and outputs not in seen:
+            seen.add(outputs)
+            if ERROR not in outputs:
+                found.append((tuple(args), outputs))
+    return found
+
+def run_level(bank, observational_equivalence, tasks, workers):
+    """
+    Runs `tasks` on a pool of `workers` forked processes that share the current bank.
+    Yields the result of each task in task order, so merging them is deterministic.
+    """
+    return fork_map(enumerate_shard, (bank, observational_equivalence), tasks, workers)
+
+def test_parallel_enumeration(workers=2):
+    """
+    Runs test cases 1-10 on `workers` forked processes with the parallel threshold set to 0, so that every
+    size level is sharded, and checks that the programs and counts match the sequential run.
+    """
+    # bottom_up.py imports this module
+    from bottom_up import bottom_up_xml
+    from harness import run_harness
+
+    def run(case_number, test_case):
+        start_time = time.time()
+        program, count = bottom_up_xml(20, operators, test_case)
+        sequential_time = time.time() - start_time
+        start_time = time.time()
+        parallel_program, parallel_count = bottom_up_xml(20, operators, test_case, workers=workers, parallel_threshold=0)
+        parallel_time = time.time() - start_time
+        matches = solves(parallel_program, test_case) and str(parallel_program) == str(program) and parallel_count == count
+        yield matches, (case_number, count, parallel_count, sequential_time, parallel_time, parallel_program)
+    return run_harness("Parallel Enumeration", ["test case", "programs", "parallel", "time (s)", "parallel", "program"], run)
+
+if __name__ == "__main__":
+    test_parallel_enumeration()
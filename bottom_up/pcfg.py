@@ -0,0 +1,116 @@
+import ast
+import math
+import sys
+import os
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from dsl import *
+from test_cases import *
+from harness import run_harness
+from bottom_up import bottom_up_xml
+
+terminal_classes = [XMLVariable, ConstantString]
+
+# solutions of test cases 1-10 that costs and libraries are learned from, kept apart from the README
+default_corpus = os.path.join(os.path.dirname(__file__), '..', 'corpus.txt')
+
+def parse_program(source):
+    """
+    Parses a program printed by the synthesizer, e.g. `RemoveAttribute(XMLVariable('input'), ConstantString('visibility'))`.
+    The source is never evaluated: only calls of DSL classes with positional arguments, strings and None are accepted.
+    """
+    productions = {production.__name__: production for production in operators + terminal_classes}
+
+    def build(node):
+        if isinstance(node, ast.Constant) and (node.value is None or isinstance(node.value, str)):
+            return node.value
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in productions and not node.keywords:
+            return productions[node.func.id](*[build(argument) for argument in node.args])
+        raise ValueError(f"not a DSL program: {ast.unparse(node)}")
+    return build(ast.parse(source.strip(), mode="eval").body)
+
+def read_corpus(path):
+    """
+    Reads the programs listed after "Synthesized program:" in a test log such as corpus.txt (see `parse_program`).
+    """
+    programs, block = [], None
+    with open(path) as file:
+        for line in file:
+            if line.startswith("Synthesized program:"):
+                block = []
+            elif block is not None:
+                if line.strip():
+                    block.append(line)
+                else:
+                    programs.append(parse_program("".join(block)))
+                    block = None
+    if block:
+        programs.append(parse_program("".join(block)))
+    return programs
+
+def production_types(production):
+    # a constant can be of every string sort, and an extracted string fills every sort
+    return string_sorts if production is ConstantString or production.return_type == "str" else [production.return_type]
+
+def count_productions(program, counts, program_type="xml"):
+    """
+    Counts the (production class, type) pairs used by `program`. The type of an argument is the one its operator
+    expects, since constants parsed from a log do not record their sort.
+    """
+    counts[(type(program), program_type)] = counts.get((type(program), program_type), 0) + 1
+    if type(program) not in terminal_classes:
+        for argument, argument_type in zip(program.arguments(), program.argument_types):
+            count_productions(argument, counts, argument_type)
+
+def fit_costs(programs, productions=operators + terminal_classes, smoothing=0.5, scale=0.4):
+    """
+    Fits a probabilistic grammar to `programs`, with one nonterminal per type: the probability of a
+    production is its smoothed count over the counts of all productions of the same return type.
+    Returns the costs round(scale * -log2 p), at least 1, by production class; a constant gets the cost of
+    its most likely sort.
+    A small scale keeps the costs coarse (1-3 on the default corpus), which enumerated fewer programs
+    on the test cases than finer costs: every distinct cost is a separate level.
+    """
+    counts = {}
+    for program in programs:
+        count_productions(program, counts)
+
+    totals = {}
+    for production in productions:
+        for production_type in production_types(production):
+            totals[production_type] = totals.get(production_type, 0) + counts.get((production, production_type), 0) + smoothing
+
+    costs = {}
+    for production in productions:
+        probability = max((counts.get((production, production_type), 0) + smoothing) / totals[production_type]
+                          for production_type in production_types(production))
+        costs[production] = max(1, round(-scale * math.log2(probability)))
+    return costs
+
+def test_weighted_enumeration(corpus=default_corpus, cost_bound=40):
+    """
+    For each of test cases 1-10, fits costs to the corpus programs of the other test cases (the corpus lists
+    them in test case order) and compares the number of programs generated with size-ordered and cost-ordered
+    enumeration.
+    """
+    programs = read_corpus(corpus)
+    costs = fit_costs(programs)
+    print("Production costs on the whole corpus:", ", ".join(f"{production.__name__}={cost}" for production, cost in costs.items()))
+    print()
+
+    def run(case_number, test_case):
+        # the case's own solution is left out, so the costs are not measured on answers used in training
+        case_costs = fit_costs(programs[:case_number - 1] + programs[case_number:])
+        _, size_count = bottom_up_xml(20, operators, test_case)
+        start_time = time.time()
+        program, cost_count = bottom_up_xml(cost_bound, operators, test_case, costs=case_costs)
+        elapsed = time.time() - start_time
+        yield solves(program, test_case), (case_number, size_count, cost_count, elapsed)
+    return run_harness("Weighted Synthesis", ["test case", "by size", "by cost", "time (s)"], run)
+
+if __name__ == "__main__":
+    # python3 bottom_up/pcfg.py [CORPUS]
+    if len(sys.argv) > 1:
+        test_weighted_enumeration(sys.argv[1])
+    else:
+        test_weighted_enumeration()
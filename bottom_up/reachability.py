@@ -0,0 +1,119 @@
+import sys
+import os
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from dsl import *
+from test_cases import *
+from harness import run_harness
+
+# the operators whose edit costs `edit_lower_bound` knows; any other operator (e.g. a learned macro) may make
+# several edits at once, so with one in the grammar only the trivial bound is used
+base_operators = set(operators)
+
+# every value fits in a context of size 3 that ignores its shape, e.g. SetTag(x, ExtractTag(v)) or
+# SetChild(x, tag, v), so no lower bound exceeds it
+context_bound = 3
+
+def edit_lower_bound(value, target):
+    """
+    Lower bound on the size of a chain of updates that turns `value` into `target`, from their shapes: the tag,
+    the attributes, the text and the child. Every update changes a single field, and costs its operator plus
+    its string and xml arguments: 2 for SetTag, SetText and RemoveAttribute, 3 for SetAttribute and SetChild,
+    and 1 for RemoveText and RemoveChild.
+    """
+    edits = 0
+    if value.tag != target.tag:
+        edits += 2
+    if value.text != target.text:
+        edits += 1 if target.text is None else 2
+    if value.child is not target.child:
+        edits += 1 if target.child is None else 3
+    if value.attributes != target.attributes:
+        target_attributes = dict(target.attributes)
+        for key, _ in value.attributes:
+            if key not in target_attributes:
+                edits += 2
+        for key, attribute_value in target.attributes:
+            if value.get_attribute(key) != attribute_value:
+                edits += 3
+    return edits
+
+class ReachabilityPruner():
+    """
+    Goal-directed pruning for the bottom-up enumerator: a program of size s whose value needs a context of
+    size at least d to become the target output, on some example, cannot be part of a solution if s + d
+    exceeds the bound, so it is not added to the bank.
+    For an xml value, d is the smallest of the edit bound, 1 plus the bound of its child (through
+    ExtractChild) and `context_bound`. A string must be consumed by an update of some xml, so d is 2.
+    Costs (see pcfg.py) are at least 1 per production, so the bounds also hold for cost-ordered enumeration.
+    """
+
+    def __init__(self):
+        self.pruned = 0
+
+    def reset(self, global_bound, operators, input_outputs):
+        self.global_bound = global_bound
+        self.exact = all(operator in base_operators for operator in operators)
+        self.targets = [output.evaluate({}) for _, output in input_outputs]
+        # lower bounds by value, one table per example
+        self.bounds = [{} for _ in self.targets]
+
+    def lower_bound(self, value, example):
+        target = self.targets[example]
+        if value is target:
+            return 0
+        if not self.exact:
+            return 1
+        bounds = self.bounds[example]
+        bound = bounds.get(value)
+        if bound is None:
+            bound = min(edit_lower_bound(value, target), context_bound)
+            if value.child is not None and bound > 1:
+                bound = min(bound, 1 + self.lower_bound(value.child, example))
+            bounds[value] = bound
+        return bound
+
+    def unreachable(self, return_type, outputs, size):
+        """
+        Returns whether the program of `size` with these outputs cannot be extended into a solution within the bound.
+        """
+        slack = self.global_bound - size
+        if slack >= context_bound:
+            return False
+        if return_type != "xml":
+            unreachable = slack < (2 if self.exact else 1)
+        else:
+            unreachable = any(self.lower_bound(value, example) > slack for example, value in enumerate(outputs))
+        if unreachable:
+            self.pruned += 1
+        return unreachable
+
+def test_reachability():
+    """
+    Runs test cases 1-10 with the bound set to the size of their smallest solution, and one and two above it,
+    where pruning applies, and compares the number of generated programs and the time with and without it.
+    """
+    from bottom_up import bottom_up_xml
+
+    def run(case_number, test_case):
+        program, _ = bottom_up_xml(20, operators, test_case)
+        solved = True
+        smallest = expression_size(program)
+        for bound in range(smallest, smallest + 3):
+            start_time = time.time()
+            _, count = bottom_up_xml(bound, operators, test_case)
+            base_time = time.time() - start_time
+            reachability = ReachabilityPruner()
+            start_time = time.time()
+            pruned_program, pruned_count = bottom_up_xml(bound, operators, test_case, reachability=reachability)
+            pruned_time = time.time() - start_time
+            # pruning is sound, so a solution within the bound is still found
+            solved = solved and solves(pruned_program, test_case) and expression_size(pruned_program) <= bound
+            # the case scores once, on its last row
+            yield solved if bound == smallest + 2 else None, \
+                (case_number, bound, count, reachability.pruned, pruned_count, base_time, pruned_time)
+    return run_harness("Synthesis With Reachability Pruning",
+                       ["test case", "bound", "programs", "pruned", "remaining", "time (s)", "pruned"], run)
+
+if __name__ == "__main__":
+    test_reachability()
@@ -0,0 +1,138 @@
+import hashlib
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from dsl import *
+from checkpoint import task_fingerprint
+
+class ResultCache():
+    """
+    Disk-backed cache of synthesis results, one pickle file per task in `directory`.
+    A task is keyed by the canonical fingerprint of its (input, output) values and operator set (see
+    `task_fingerprint`; learned macros are part of the operator set with their pattern), by the size bound, and
+    by the search options that change the program or the count, such as pruning. Entries are evicted least
+    recently used first once the directory grows past `max_bytes`; file modification times record the last use.
+    """
+
+    def __init__(self, directory, max_bytes=64 * 2**20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, global_bound, operators, input_outputs, costs, options):
+        text = f"{task_fingerprint(operators, input_outputs, costs)}:{global_bound}:{sorted((options or {}).items())!r}"
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{key}.pickle")
+
+    def get(self, global_bound, operators, input_outputs, costs=None, options=None):
+        """
+        Returns the cached (program, expression count) of the task, or None on a miss.
+        `options` is a dict of the search options (see `bottom_up_xml`).
+        A cached program is re-evaluated on the examples and dropped if it no longer produces the outputs.
+        """
+        path = self._path(global_bound, operators, input_outputs, costs, options)
+        try:
+            with open(path, "rb") as file:
+                program, expression_count = pickle.load(file)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception:
+            # a truncated or corrupt entry can fail in many ways while unpickling; it is a miss and is dropped
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.misses += 1
+            return None
+        if program is not None and not solves(program, input_outputs):
+            os.remove(path)
+            self.misses += 1
+            return None
+        os.utime(path)
+        self.hits += 1
+        return program, expression_count
+
+    def put(self, global_bound, operators, input_outputs, program, expression_count, costs=None, options=None):
+        path = self._path(global_bound, operators, input_outputs, costs, options)
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as file:
+            pickle.dump((program, expression_count), file)
+        os.replace(temporary, path)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".pickle"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+
+def test_result_cache():
+    """
+    Checks that a second synthesis of the same task hits the cache, that a stored program that no longer solves
+    its task is rejected and removed, that a corrupt or unpicklable entry is removed, and that the least recently
+    used entries are evicted once the cache grows past its size bound.
+    """
+    # imported here, since bottom_up.py imports this module for --cache
+    from bottom_up import bottom_up_xml
+    from harness import run_harness
+    from test_cases import test_case_1, test_case_2, test_case_3, test_case_6
+
+    def check_hit(cache):
+        first = bottom_up_xml(20, operators, test_case_3, cache=cache)
+        second = bottom_up_xml(20, operators, test_case_3, cache=cache)
+        return cache.hits == 1 and cache.misses == 1 and str(second[0]) == str(first[0]) and second[1] == first[1]
+
+    def check_stale(cache):
+        # the input itself does not produce the output of test case 1
+        cache.put(20, operators, test_case_1, XMLVariable('input'), 1)
+        path = cache._path(20, operators, test_case_1, None, None)
+        return cache.get(20, operators, test_case_1) is None and not os.path.exists(path)
+
+    def check_corrupt(cache):
+        path = cache._path(20, operators, test_case_1, None, None)
+        removed = []
+        # truncated data, and a pickle of a class that does not exist
+        for content in [b"\x80\x04\x95", b"cmissing_module\nMissing\n)R."]:
+            with open(path, "wb") as file:
+                file.write(content)
+            removed.append(cache.get(20, operators, test_case_1) is None and not os.path.exists(path))
+        return all(removed)
+
+    def check_eviction(cache):
+        tasks = [test_case_1, test_case_2, test_case_6]
+        paths = [cache._path(20, operators, task, None, None) for task in tasks]
+        for task in tasks:
+            cache.put(20, operators, task, *bottom_up_xml(20, operators, task))
+        for age, path in enumerate(paths):
+            os.utime(path, (1000 * (age + 1), 1000 * (age + 1)))
+        # the first entry is the oldest until it is used; then the second one is the least recently used
+        cache.get(20, operators, tasks[0])
+        cache.max_bytes = os.path.getsize(paths[0]) + os.path.getsize(paths[2])
+        cache.put(20, operators, tasks[2], *bottom_up_xml(20, operators, tasks[2]))
+        return [os.path.exists(path) for path in paths] == [True, False, True]
+
+    def run(name, check):
+        directory = tempfile.mkdtemp()
+        try:
+            passed = check(ResultCache(directory))
+        finally:
+            shutil.rmtree(directory)
+        yield passed, (name, "yes" if passed else "no")
+    checks = [("hit", check_hit), ("stale", check_stale), ("corrupt", check_corrupt), ("eviction", check_eviction)]
+    return run_harness("Result Cache", ["check", "passed"], run, checks)
+
+if __name__ == "__main__":
+    test_result_cache()
@@ -0,0 +1,70 @@
+import sys
+import os
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from dsl import *
+from test_cases import *
+from harness import run_harness
+from bottom_up import bottom_up_xml
+from version_space import version_space_xml
+
+class SynthesisSession():
+    """
+    Synthesis over examples that arrive one at a time. The session keeps the version space of the programs
+    up to `global_bound` that are consistent with the examples so far; a program consistent with a new example
+    is one of them, so adding the example evaluates the retained programs on the new input only and splits
+    the sub-goal nodes whose programs now diverge (see `VersionSpace.split`), instead of enumerating again.
+    The constants are harvested from the first examples, so the space is rebuilt from every example when no
+    program is left, e.g. because the new example needs a constant that the first ones did not show.
+    """
+
+    def __init__(self, global_bound, operators, input_outputs):
+        self.global_bound = global_bound
+        self.operators = operators
+        self.input_outputs = list(input_outputs)
+        self.rebuilds = 0
+        self.space = version_space_xml(global_bound, operators, self.input_outputs)
+
+    def add_example(self, inputs, output):
+        self.input_outputs.append((inputs, output))
+        self.space = self.space.intersect(inputs, output)
+        if self.space.root is None:
+            self.rebuilds += 1
+            self.space = version_space_xml(self.global_bound, self.operators, self.input_outputs)
+
+    def program(self):
+        """
+        Returns the smallest program consistent with every example, or None.
+        """
+        best = self.space.top_k(1)
+        return best[0][1] if best else None
+
+def test_session():
+    """
+    Starts a session on one test case and adds the examples of the test cases with the same transformation
+    one at a time, comparing the time of each addition with a rerun of `bottom_up_xml` on all the examples.
+    """
+    groups = [(1, 6), (2, 7, 8), (3, 9), (5, 10)]
+
+    def run(first_case, group):
+        first, _ = bottom_up_xml(20, operators, base_test_cases[first_case - 1])
+        bound = expression_size(first) + 1
+        session = SynthesisSession(bound, operators, base_test_cases[first_case - 1])
+        examples = list(base_test_cases[first_case - 1])
+        for case_number in group[1:]:
+            start_time = time.time()
+            session.add_example(*base_test_cases[case_number - 1][0])
+            session_time = time.time() - start_time
+            examples += base_test_cases[case_number - 1]
+            start_time = time.time()
+            rerun, _ = bottom_up_xml(bound, operators, examples)
+            rerun_time = time.time() - start_time
+            program = session.program()
+            solved = solves(program, examples) and expression_size(program) == expression_size(rerun)
+            label = ", ".join(str(number) for number in group[:group.index(case_number) + 1])
+            yield solved, (label, bound, session.space.count(), session.rebuilds, session_time, rerun_time, program)
+    return run_harness("Incremental Synthesis", ["examples", "bound", "programs", "rebuilds", "time (s)", "rerun", "program"], run,
+                       [(group[0], group) for group in groups])
+
+if __name__ == "__main__":
+    test_session()
@@ -0,0 +1,284 @@
+import inspect
+import random
+import sys
+import os
+import time
+from array import array
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from dsl import *
+from test_cases import *
+from harness import harness_table
+
+class Hole(Expression):
+    """
+    Parameter of a rewrite rule, used to build the rule's patterns from the DSL constructors.
+    """
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __str__(self):
+        return f"?{self.name}"
+
+    def arguments(self):
+        return []
+
+class RewriteRule():
+    """
+    Equivalence `lhs == rhs` between two programs over the holes `parameters`, where `lhs` and `rhs` build
+    the programs from one expression per hole. A candidate matching `lhs` is skipped by the enumerator,
+    because `rhs` (or a program with the same outputs) is enumerated at the same size or smaller.
+    The outermost operator of `lhs` must take the inner operator as its first argument.
+    Side conditions, checked on every example:
+        distinct: pairs of holes whose values always differ
+        ordered: pair of holes (a, b) such that the rule only applies when a's bank row precedes b's.
+            Used by rules whose two sides have the same size, so that exactly one of them is kept.
+    """
+
+    def __init__(self, name, lhs, rhs, parameters=None, distinct=(), ordered=None):
+        self.name = name
+        self.lhs = lhs
+        self.rhs = rhs
+        self.parameters = parameters or list(inspect.signature(lhs).parameters)
+        self.distinct = distinct
+        self.ordered = ordered
+
+        holes = [Hole(name) for name in self.parameters]
+        self.pattern = lhs(*holes)
+        self.outer, self.inner = type(self.pattern), type(self.pattern.arguments()[0])
+        # a bare-hole right-hand side may be a terminal, whose outputs are not in the equivalence table
+        rhs_pattern = rhs(*holes)
+        self.rhs_hole = rhs_pattern.name if isinstance(rhs_pattern, Hole) else None
+
+        self.hole_types = {}
+        # positions of the holes in the candidate's rows: the inner operator's children, then the outer operator's other arguments
+        positions = {}
+        inner_pattern = self.pattern.arguments()[0]
+        for position, (argument, argument_type) in enumerate(
+                list(zip(inner_pattern.arguments(), inner_pattern.argument_types)) +
+                list(zip(self.pattern.arguments()[1:], self.pattern.argument_types[1:]))):
+            assert isinstance(argument, Hole), "rules match two levels of operators"
+            self.hole_types[argument.name] = argument_type
+            positions.setdefault(argument.name, []).append(position)
+        self.inner_arity = len(inner_pattern.arguments())
+        self.repeats = [(first, other) for first, *others in positions.values() for other in others]
+        self.rhs_position = positions[self.rhs_hole][0] if self.rhs_hole is not None else None
+        self.ordered_positions = tuple(positions[name][0] for name in ordered) if ordered is not None else None
+        self.distinct_positions = [(positions[first][0], positions[second][0]) for first, second in distinct]
+        # whether the rule only looks at the inner operator's children, i.e. only at the first argument
+        used = [position for pair in self.repeats + self.distinct_positions for position in pair]
+        used += [self.rhs_position] if self.rhs_position is not None else []
+        used += list(self.ordered_positions or ())
+        self.first_argument_only = all(position < self.inner_arity for position in used)
+
+    def __str__(self):
+        holes = [Hole(name) for name in self.parameters]
+        return f"{self.name}: {self.lhs(*holes)} -> {self.rhs(*holes)}"
+
+    def matches(self, bank, rows):
+        """
+        Whether a candidate is an instance of `lhs`, given that its outer and inner operators match.
+        `rows` are the bank rows of the inner operator's children followed by the outer operator's other arguments.
+        """
+        outputs = bank.outputs
+        for first, second in self.repeats:
+            if rows[first] != rows[second] and outputs[rows[first]] != outputs[rows[second]]:
+                return False
+        if self.rhs_position is not None and bank.operator_ids[rows[self.rhs_position]] < 0:
+            return False
+        if self.ordered_positions is not None and not rows[self.ordered_positions[0]] < rows[self.ordered_positions[1]]:
+            return False
+        return all(a != b for first, second in self.distinct_positions for a, b in zip(outputs[rows[first]], outputs[rows[second]]))
+
+def commute(outer, inner):
+    """
+    outer(inner(x, b...), a...) == inner(outer(x, a...), b...) for operators that update different fields.
+    """
+    a = [f"a{i}" for i in range(len(outer.argument_types) - 1)]
+    b = [f"b{i}" for i in range(len(inner.argument_types) - 1)]
+
+    def lhs(x, *holes):
+        return outer(inner(x, *holes[len(a):]), *holes[:len(a)])
+
+    def rhs(x, *holes):
+        return inner(outer(x, *holes[:len(a)]), *holes[len(a):])
+    return RewriteRule(f"{outer.__name__} commutes with {inner.__name__}", lhs, rhs, ["x"] + a + b)
+
+def read_through(extract, update):
+    """
+    extract(update(x, b...), a...) == extract(x, a...) when `update` does not touch the field read by `extract`.
+    """
+    a = [f"a{i}" for i in range(len(extract.argument_types) - 1)]
+    b = [f"b{i}" for i in range(len(update.argument_types) - 1)]
+    return RewriteRule(f"{extract.__name__} reads through {update.__name__}",
+                       lambda x, *holes: extract(update(x, *holes[len(a):]), *holes[:len(a)]),
+                       lambda x, *holes: extract(x, *holes[:len(a)]),
+                       ["x"] + a + b)
+
+# operators that update each field of an xml value
+field_updates = {
+    "tag": [SetTag],
+    "text": [SetText, RemoveText],
+    "child": [SetChild, RemoveChild],
+    "attributes": [SetAttribute, RemoveAttribute],
+}
+field_extracts = {"tag": ExtractTag, "text": ExtractText, "child": ExtractChild, "attributes": ExtractAttribute}
+
+rules = [
+    # the last update of a field wins
+    RewriteRule("RemoveText is idempotent", lambda x: RemoveText(RemoveText(x)), lambda x: RemoveText(x)),
+    RewriteRule("RemoveChild is idempotent", lambda x: RemoveChild(RemoveChild(x)), lambda x: RemoveChild(x)),
+    RewriteRule("RemoveAttribute is idempotent", lambda x, k: RemoveAttribute(RemoveAttribute(x, k), k), lambda x, k: RemoveAttribute(x, k)),
+    RewriteRule("SetTag overwrites SetTag", lambda x, a, b: SetTag(SetTag(x, a), b), lambda x, a, b: SetTag(x, b)),
+    RewriteRule("SetText overwrites SetText", lambda x, a, b: SetText(SetText(x, a), b), lambda x, a, b: SetText(x, b)),
+    RewriteRule("SetChild overwrites SetChild", lambda x, c, a, d, b: SetChild(SetChild(x, c, a), d, b), lambda x, c, a, d, b: SetChild(x, d, b)),
+    RewriteRule("SetAttribute overwrites SetAttribute", lambda x, k, a, b: SetAttribute(SetAttribute(x, k, a), k, b), lambda x, k, a, b: SetAttribute(x, k, b)),
+    RewriteRule("RemoveText overwrites SetText", lambda x, t: RemoveText(SetText(x, t)), lambda x, t: RemoveText(x)),
+    RewriteRule("RemoveChild overwrites SetChild", lambda x, c, v: RemoveChild(SetChild(x, c, v)), lambda x, c, v: RemoveChild(x)),
+    RewriteRule("RemoveAttribute overwrites SetAttribute", lambda x, k, v: RemoveAttribute(SetAttribute(x, k, v), k), lambda x, k, v: RemoveAttribute(x, k)),
+    RewriteRule("SetText overwrites RemoveText", lambda x, t: SetText(RemoveText(x), t), lambda x, t: SetText(x, t)),
+    RewriteRule("SetChild overwrites RemoveChild", lambda x, c, v: SetChild(RemoveChild(x), c, v), lambda x, c, v: SetChild(x, c, v)),
+    RewriteRule("SetAttribute overwrites RemoveAttribute", lambda x, k, v: SetAttribute(RemoveAttribute(x, k), k, v), lambda x, k, v: SetAttribute(x, k, v)),
+
+    # reading the field that was just written
+    RewriteRule("ExtractTag of SetTag", lambda x, t: ExtractTag(SetTag(x, t)), lambda x, t: t),
+    RewriteRule("ExtractText of SetText", lambda x, t: ExtractText(SetText(x, t)), lambda x, t: t),
+    RewriteRule("ExtractChild of SetChild", lambda x, c, v: ExtractChild(SetChild(x, c, v)), lambda x, c, v: v),
+    RewriteRule("ExtractAttribute of SetAttribute", lambda x, k, v: ExtractAttribute(SetAttribute(x, k, v), k), lambda x, k, v: v),
+    RewriteRule("ExtractAttribute reads through SetAttribute of another key",
+                lambda x, k, j, v: ExtractAttribute(SetAttribute(x, j, v), k), lambda x, k, j, v: ExtractAttribute(x, k), distinct=[("k", "j")]),
+    RewriteRule("ExtractAttribute reads through RemoveAttribute of another key",
+                lambda x, k, j: ExtractAttribute(RemoveAttribute(x, j), k), lambda x, k, j: ExtractAttribute(x, k), distinct=[("k", "j")]),
+
+    # updates of different keys commute; the chain is kept with the later key row outermost
+    RewriteRule("SetAttribute chains commute", lambda x, k, v, j, w: SetAttribute(SetAttribute(x, k, v), j, w),
+                lambda x, k, v, j, w: SetAttribute(SetAttribute(x, j, w), k, v), distinct=[("k", "j")], ordered=("j", "k")),
+    RewriteRule("RemoveAttribute chains commute", lambda x, k, j: RemoveAttribute(RemoveAttribute(x, k), j),
+                lambda x, k, j: RemoveAttribute(RemoveAttribute(x, j), k), ordered=("j", "k")),
+    RewriteRule("RemoveAttribute commutes with SetAttribute of another key", lambda x, k, v, j: RemoveAttribute(SetAttribute(x, k, v), j),
+                lambda x, k, v, j: SetAttribute(RemoveAttribute(x, j), k, v), distinct=[("k", "j")]),
+]
+# updates of different fields commute; the chain is kept with the later field (in `field_updates` order) outermost
+fields = list(field_updates)
+rules += [commute(outer, inner)
+          for i, outer_field in enumerate(fields) for inner_field in fields[i + 1:]
+          for outer in field_updates[outer_field] for inner in field_updates[inner_field]]
+# extracting a field ignores updates of the other fields
+rules += [read_through(field_extracts[extract_field], update)
+          for extract_field in fields for update_field in fields if update_field != extract_field
+          for update in field_updates[update_field]]
+
+class SymmetryBreaker():
+    """
+    Consults `rules` on arena rows before a candidate is evaluated, and counts the skipped candidates per rule.
+    """
+
+    def __init__(self, rules=rules):
+        self.rules = rules
+        self.skipped = {}
+
+    @property
+    def total_skipped(self):
+        return sum(self.skipped.values())
+
+    def prune(self, bank, operator, argument_combinations):
+        """
+        Applies the rules for candidates of `operator` over the argument row lists `argument_combinations`.
+        Rules that only depend on the first argument remove its rows up front. Returns the remaining row lists
+        and a function from a candidate's argument rows to whether it is redundant (None if no rule is left to check).
+        """
+        first_rules, candidate_rules = {}, {}
+        for rule in self.rules:
+            if rule.outer is operator:
+                by_inner = first_rules if rule.first_argument_only else candidate_rules
+                by_inner.setdefault(bank.operator_id(rule.inner), []).append(rule)
+        operator_ids, child_starts, child_ids, skipped = bank.operator_ids, bank.child_starts, bank.child_ids, self.skipped
+
+        if first_rules:
+            others = 1
+            for rows in argument_combinations[1:]:
+                others *= len(rows)
+            kept = array('q')
+            for row in argument_combinations[0]:
+                for rule in first_rules.get(operator_ids[row], ()):
+                    if rule.matches(bank, child_ids[child_starts[row]:child_starts[row + 1]]):
+                        skipped[rule.name] = skipped.get(rule.name, 0) + others
+                        break
+                else:
+                    kept.append(row)
+            argument_combinations = [kept] + argument_combinations[1:]
+        if not candidate_rules:
+            return argument_combinations, None
+
+        def redundant(args):
+            rules = candidate_rules.get(operator_ids[args[0]])
+            if rules is not None:
+                rows = child_ids[child_starts[args[0]]:child_starts[args[0] + 1]].tolist() + list(args[1:])
+                for rule in rules:
+                    if rule.matches(bank, rows):
+                        skipped[rule.name] = skipped.get(rule.name, 0) + 1
+                        return True
+            return False
+        return argument_combinations, redundant
+
+def random_xml(rng, depth=2):
+    tags, keys, texts = ["a", "b", "body"], ["k", "j", "body"], ["t", "u", None]
+    attributes = [(ConstantString(key), ConstantString(rng.choice(["v", "w", "body"]))) for key in keys if rng.random() < 0.5]
+    child = random_xml(rng, depth - 1) if depth > 0 and rng.random() < 0.6 else None
+    text = rng.choice(texts)
+    return XMLTag(ConstantString(rng.choice(tags)), attributes, ConstantString(text) if text else None, child)
+
+def random_argument(rng, argument_type):
+    if argument_type == "xml":
+        return random_xml(rng)
+    if rng.random() < 0.2:
+        # the text of an element without text is None, like string programs in the bank can be
+        return ExtractText(XMLTag(ConstantString("a", "tag"), [], None, None))
+    return ConstantString(rng.choice(["k", "j", "body", "a", "t"]), argument_type)
+
+def check_rules(rules=rules, trials=300, seed=0):
+    """
+    Property test of every rule against the reference semantics: on random arguments satisfying
+    the side conditions, `lhs` and `rhs` must evaluate to the same value unless `lhs` fails. Returns the failing rules.
+    """
+    rng = random.Random(seed)
+    failures = []
+    for rule in rules:
+        for _ in range(trials):
+            arguments = {name: random_argument(rng, rule.hole_types[name]) for name in rule.parameters}
+            values = {name: argument.evaluate({}) for name, argument in arguments.items()}
+            if any(values[first] == values[second] for first, second in rule.distinct):
+                continue
+            lhs = rule.lhs(*[arguments[name] for name in rule.parameters]).evaluate({})
+            rhs = rule.rhs(*[arguments[name] for name in rule.parameters]).evaluate({})
+            # a failing lhs is never stored in the bank, so skipping it is always safe
+            if lhs is not ERROR and lhs != rhs:
+                failures.append(rule)
+                print(f"Rule failed: {rule}\n  arguments: {values}\n  lhs: {lhs}\n  rhs: {rhs}")
+                break
+    print(f"[+] Rewrite rules: {len(rules) - len(failures)}/{len(rules)} hold on {trials} random cases")
+    return failures
+
+def test_symmetry_breaking():
+    """
+    Compares the number of generated programs and the time on test cases 1-10 with and without the rules.
+    """
+    from bottom_up import bottom_up_xml
+
+    def run(case_number, test_case):
+        start_time = time.time()
+        _, count = bottom_up_xml(20, operators, test_case)
+        base_time = time.time() - start_time
+        symmetry = SymmetryBreaker()
+        start_time = time.time()
+        program, symmetry_count = bottom_up_xml(20, operators, test_case, symmetry=symmetry)
+        symmetry_time = time.time() - start_time
+        # the rules are checked by `check_rules`, so the rows are not scored
+        yield None, (case_number, count, symmetry_count, symmetry.total_skipped, base_time, symmetry_time)
+    print()
+    harness_table(["test case", "programs", "with rules", "skipped", "time (s)", "with rules"], run)
+
+if __name__ == "__main__":
+    check_rules()
+    test_symmetry_breaking()
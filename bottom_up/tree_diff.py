@@ -0,0 +1,265 @@
+import sys
+import os
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from dsl import *
+from test_cases import *
+from harness import run_harness
+from bottom_up import bottom_up_xml
+
+# An xml value has at most one child, so its tree is a chain of elements, and the ordered tree edit distance
+# (Zhang-Shasha) of two chains is the edit distance of the chains: elements are deleted, inserted, or matched
+# and relabelled, where the cost of a relabelling is the number of field edits (see `field_edits`).
+
+def chain(value):
+    nodes = []
+    while value is not None:
+        nodes.append(value)
+        value = value.child
+    return nodes
+
+def field_edits(value, target):
+    """
+    The edits of the tag, attributes and text that turn the element `value` into `target`, ignoring their
+    children, as ("tag", tag), ("text", text), ("remove_text",), ("attribute", key, value) and ("remove_attribute", key).
+    """
+    edits = []
+    if value.tag != target.tag:
+        edits.append(("tag", target.tag))
+    for key, _ in value.attributes:
+        if target.get_attribute(key) is None:
+            edits.append(("remove_attribute", key))
+    for key, attribute_value in target.attributes:
+        if value.get_attribute(key) != attribute_value:
+            edits.append(("attribute", key, attribute_value))
+    if value.text != target.text:
+        edits.append(("remove_text",) if target.text is None else ("text", target.text))
+    return edits
+
+def align(value, target):
+    """
+    Returns (distance, matches) for the cheapest alignment of the chains of `value` and `target`, where deleting
+    or inserting an element costs 1, and matches[j] is the depth of the element of `value` matched with the
+    element of `target` at depth j, or None if that element is inserted.
+    """
+    nodes, targets = chain(value), chain(target)
+    # distances[i][j]: cost of aligning the first i elements of `value` with the first j of `target`
+    distances = [[i + j if i == 0 or j == 0 else None for j in range(len(targets) + 1)] for i in range(len(nodes) + 1)]
+    for i in range(1, len(nodes) + 1):
+        for j in range(1, len(targets) + 1):
+            distances[i][j] = min(distances[i - 1][j] + 1, distances[i][j - 1] + 1,
+                                  distances[i - 1][j - 1] + len(field_edits(nodes[i - 1], targets[j - 1])))
+    matches = [None] * len(targets)
+    i, j = len(nodes), len(targets)
+    while i > 0 and j > 0:
+        if distances[i][j] == distances[i - 1][j - 1] + len(field_edits(nodes[i - 1], targets[j - 1])):
+            matches[j - 1] = i - 1
+            i, j = i - 1, j - 1
+        elif distances[i][j] == distances[i - 1][j] + 1:
+            i -= 1
+        else:
+            j -= 1
+    return distances[len(nodes)][len(targets)], matches
+
+def edit_script(value, target):
+    """
+    The ordered edit script of the cheapest alignment, from the root down, as (depth, edit) pairs with the
+    edits of `field_edits`, ("delete",) and ("insert",); the depth is the one in `target`, or in `value` for a deletion.
+    """
+    _, matches = align(value, target)
+    nodes, targets = chain(value), chain(target)
+    script, next_node = [], 0
+    for depth, match in enumerate(matches):
+        if match is None:
+            script.append((depth, ("insert",)))
+            continue
+        script.extend((deleted, ("delete",)) for deleted in range(next_node, match))
+        script.extend((depth, edit) for edit in field_edits(nodes[match], targets[depth]))
+        next_node = match + 1
+    script.extend((deleted, ("delete",)) for deleted in range(next_node, len(nodes)))
+    return script
+
+def path(variable, depth):
+    expr = variable
+    for _ in range(depth):
+        expr = ExtractChild(expr)
+    return expr
+
+class SketchBuilder():
+    """
+    Turns the edit script between the input and the output of one example into a chain of updates of the
+    input variable: matched elements are read with ExtractChild, deleted ones are skipped with SetChild or
+    RemoveChild, and an inserted element is a copy of the next input element with its fields edited.
+    The strings of the updates are holes, filled with the smallest expression that gives the string wanted
+    at the same place of every example's output: an ExtractTag, ExtractText or ExtractAttribute of an input
+    element, or else a constant. Strings that can be copied from the input are not constants, as in `make_terminals`.
+    """
+
+    def __init__(self, input_outputs):
+        self.input_outputs = input_outputs
+        self.targets = [chain(output.evaluate({})) for _, output in input_outputs]
+        self.candidates = []
+        for name, value in input_outputs[0][0].items():
+            if not isinstance(value, XMLTag):
+                continue
+            for depth, node in enumerate(chain(value.evaluate({}))):
+                element = path(XMLVariable(name), depth)
+                reads = [ExtractTag(element), ExtractText(element)]
+                reads += [ExtractAttribute(element, ConstantString(key, "key")) for key, _ in node.attributes]
+                for expr in reads:
+                    self.candidates.append((expr, tuple(expr.evaluate(inputs) for inputs, _ in input_outputs)))
+
+    def hole(self, sort, depth, field):
+        """
+        Returns an expression of `sort` whose value on every example is `field` of the output element at `depth`,
+        or None. Extractions return a generic string, so any of them fills a hole of any sort.
+        """
+        wanted = tuple(field(targets[depth]) if depth < len(targets) else None for targets in self.targets)
+        if None in wanted:
+            return None
+        for expr, outputs in self.candidates:
+            if outputs == wanted:
+                return expr
+        if len(set(wanted)) == 1:
+            return ConstantString(wanted[0], sort)
+        return None
+
+    def sketch(self, example):
+        """
+        Returns the program of the edit script of `example` (an index into the examples), or None if a hole cannot be filled.
+        """
+        inputs, output = self.input_outputs[example]
+        target = output.evaluate({})
+        variables = [(name, value.evaluate({})) for name, value in inputs.items() if isinstance(value, XMLTag)]
+        if not variables:
+            return None
+        # edit the input variable that is closest to the output
+        name, value = min(variables, key=lambda variable: align(variable[1], target)[0])
+        _, matches = align(value, target)
+        return self.build(XMLVariable(name), chain(value), chain(target), matches, 0, 0)
+
+    def build(self, variable, nodes, targets, matches, depth, next_node):
+        match = matches[depth]
+        source = match if match is not None else min(next_node, len(nodes) - 1)
+        expr, value, target = path(variable, source), nodes[source], targets[depth]
+        if match is not None:
+            next_node = match + 1
+        if value is target:
+            return expr
+
+        for edit in field_edits(value, target):
+            if edit[0] == "remove_attribute":
+                expr = RemoveAttribute(expr, ConstantString(edit[1], "key"))
+            elif edit[0] == "remove_text":
+                expr = RemoveText(expr)
+            else:
+                if edit[0] == "tag":
+                    string = self.hole("tag", depth, lambda node: node.tag)
+                elif edit[0] == "text":
+                    string = self.hole("value", depth, lambda node: node.text)
+                else:
+                    string = self.hole("value", depth, lambda node, key=edit[1]: node.get_attribute(key))
+                if string is None:
+                    return None
+                if edit[0] == "tag":
+                    expr = SetTag(expr, string)
+                elif edit[0] == "text":
+                    expr = SetText(expr, string)
+                else:
+                    expr = SetAttribute(expr, ConstantString(edit[1], "key"), string)
+
+        if target.child is None:
+            if value.child is not None:
+                expr = RemoveChild(expr)
+        elif target.child is not value.child:
+            child = self.build(variable, nodes, targets, matches, depth + 1, next_node)
+            if child is None:
+                return None
+            expr = SetChild(expr, ConstantString(target.child.tag, "tag"), child)
+        return expr
+
+def productions(expr, used=None):
+    """
+    The classes of the operators and terminals of `expr`.
+    """
+    used = set() if used is None else used
+    used.add(type(expr))
+    for argument in expr.arguments():
+        productions(argument, used)
+    return used
+
+def tree_diff_xml(global_bound, operators, input_outputs, priority_cost=2):
+    """
+    global_bound: int. Upper bound on expression size.
+    operators: List of operator classes for XML.
+    input_outputs: List of input-output XML pairs.
+    priority_cost: int. Cost of the operators that no sketch uses, when enumerating.
+    Returns (program, number of programs generated) like `bottom_up_xml`. The sketch of each example's edit
+    script is checked against every example first, and one that is consistent, within the bound and made of
+    `operators` is returned with a count of 0. Otherwise programs are enumerated by cost (see pcfg.py): the
+    operators of the sketches cost 1 and the other ones `priority_cost`, up to a cost of `global_bound`. Every
+    production costs at least 1, so that pass stays within the size bound. Programs that only fit the bound by
+    size are then enumerated by size, unless every operator costs 1 and the cost pass already covered them.
+    If no example has a sketch, there is nothing to prefer, and programs are only enumerated by size.
+    """
+    builder = SketchBuilder(input_outputs)
+    allowed = set(operators) | {XMLVariable, ConstantString}
+    preferred = set()
+    for example in range(len(input_outputs)):
+        sketch = builder.sketch(example)
+        if sketch is None:
+            continue
+        used = productions(sketch)
+        if used <= allowed and expression_size(sketch) <= global_bound and solves(sketch, input_outputs):
+            return sketch, 0
+        preferred |= used
+
+    if not preferred & set(operators):
+        # a cost pass would only reorder the size pass, and enumerate its programs twice when it fails
+        return bottom_up_xml(global_bound, operators, input_outputs)
+
+    costs = {operator: 1 if operator in preferred else priority_cost for operator in operators}
+    program, expression_count = bottom_up_xml(global_bound, operators, input_outputs, costs=costs)
+    if program is not None or all(cost == 1 for cost in costs.values()):
+        return program, expression_count
+    program, size_count = bottom_up_xml(global_bound, operators, input_outputs)
+    return program, expression_count + size_count
+
+def test_tree_diff_xml():
+    """
+    Compares tree-diff sketching with `bottom_up_xml` on test cases 1-10, on test cases 11 and 12, which are
+    beyond the reach of enumeration, and on test case 16, which has no sketch. The priority counts of test cases
+    that are sketched are those of the enumeration by priorities, as if no sketch were consistent. On test cases
+    1-10, the bound is also set to the size of the smallest solution and to one below it, where the result must
+    stay within the bound. A task without a sketch must not generate more programs than `bottom_up_xml`.
+    """
+
+    def run(case_number, test_case):
+        inputs, output = test_case[0]
+        edits = len(edit_script(inputs["input"].evaluate({}), output.evaluate({})))
+        start_time = time.time()
+        program, tree_diff_count = tree_diff_xml(20, operators, test_case)
+        sketch_time = time.time() - start_time
+        count = priority_count = bottom_up_time = "-"
+        bounded = True
+        if case_number not in (11, 12):
+            start_time = time.time()
+            smallest, count = bottom_up_xml(20, operators, test_case)
+            bottom_up_time = time.time() - start_time
+            sketch = SketchBuilder(test_case).sketch(0)
+            if sketch is None:
+                bounded = tree_diff_count <= count
+            else:
+                costs = {operator: 1 if operator in productions(sketch) else 2 for operator in operators}
+                _, priority_count = bottom_up_xml(20, operators, test_case, costs=costs)
+        if case_number <= len(base_test_cases):
+            bound = expression_size(smallest)
+            tight, _ = tree_diff_xml(bound, operators, test_case)
+            below, _ = tree_diff_xml(bound - 1, operators, test_case)
+            bounded = tight is not None and expression_size(tight) <= bound and below is None
+        yield bounded and solves(program, test_case), (case_number, edits, count, priority_count, tree_diff_count, bottom_up_time, sketch_time, program)
+    return run_harness("Tree-Diff Synthesis", ["test case", "edits", "bottom-up", "priority", "tree-diff", "time (s)", "sketch", "program"], run,
+                       list(enumerate(base_test_cases + [test_case_11, test_case_12], 1)) + [(16, test_case_16)])
+
+if __name__ == "__main__":
+    test_tree_diff_xml()
@@ -0,0 +1,380 @@
+import heapq
+import itertools
+import sys
+import os
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from dsl import *
+from test_cases import *
+from harness import harness_table, report
+from bottom_up import ProgramBank, bottom_up_generator, bottom_up_xml, make_terminals, production_cost
+
+class VersionSpace():
+    """
+    Shared DAG of program sets, one node per sub-goal. Node i stands for the programs whose values on the
+    examples are outputs[i], and its edges are (production, argument nodes) pairs: an operator class applied
+    to any programs of the argument nodes, or a terminal expression with no arguments. A node holds the
+    programs of size at most `global_bound` built from its edges, and `sizes[i]` is the smallest of them.
+    Programs are counted, ranked and extracted from the DAG without enumerating the whole set.
+    """
+
+    def __init__(self, global_bound, input_outputs):
+        self.global_bound = global_bound
+        self.input_outputs = list(input_outputs)
+        self.outputs = []
+        self.sizes = []
+        self.edges = []
+        self.root = None
+        # number of programs by node and size
+        self.counts = []
+
+    def __len__(self):
+        return len(self.outputs)
+
+    def add_node(self, outputs, size):
+        self.outputs.append(outputs)
+        self.sizes.append(size)
+        self.edges.append([])
+        return len(self.outputs) - 1
+
+    def edge_count(self):
+        return sum(len(edges) for edges in self.edges)
+
+    def restrict(self, roots):
+        """
+        Returns the version space of the programs of the `roots` nodes, joined into one root, with only the nodes
+        and edges used by one of them. A node is kept if its smallest program fits in the smallest context that it
+        has under the root, and an edge if its smallest program fits in the context of its node; contexts are found
+        shortest first.
+        """
+        space = VersionSpace(self.global_bound, self.input_outputs)
+        if not roots:
+            return space
+        root_edges = list(dict.fromkeys(edge for root in roots for edge in self.edges[root]))
+
+        def edge_size(arguments):
+            return 1 + sum(self.sizes[argument] for argument in arguments)
+
+        contexts = {}
+        heap = []
+
+        def visit(context, edges):
+            for _, arguments in edges:
+                size = edge_size(arguments)
+                if context + size <= self.global_bound:
+                    for argument in arguments:
+                        argument_context = context + size - self.sizes[argument]
+                        if argument_context < contexts.get(argument, self.global_bound + 1):
+                            contexts[argument] = argument_context
+                            heapq.heappush(heap, (argument_context, argument))
+
+        visit(0, root_edges)
+        while heap:
+            context, node = heapq.heappop(heap)
+            if context == contexts[node]:
+                visit(context, self.edges[node])
+
+        space.root = space.add_node(self.outputs[roots[0]], min(self.sizes[root] for root in roots))
+        nodes = {node: space.add_node(self.outputs[node], self.sizes[node]) for node in contexts}
+
+        def kept(context, edges):
+            return [(production, tuple(nodes[argument] for argument in arguments)) for production, arguments in edges
+                    if context + edge_size(arguments) <= self.global_bound]
+
+        space.edges[space.root] = kept(0, root_edges)
+        for node, new_node in nodes.items():
+            space.edges[new_node] = kept(contexts[node], self.edges[node])
+        return space
+
+    def splits(self, arguments, total):
+        """
+        Generates the ways of splitting `total` among `arguments` with every part at least the argument's smallest size.
+        """
+        if len(arguments) == 1:
+            if total >= self.sizes[arguments[0]]:
+                yield (total,)
+            return
+        rest = sum(self.sizes[argument] for argument in arguments[1:])
+        for size in range(self.sizes[arguments[0]], total - rest + 1):
+            for split in self.splits(arguments[1:], total - size):
+                yield (size,) + split
+
+    def partitions(self, arguments, size):
+        """
+        Splits `size` minus the operator among `arguments`, skipping the splits where an argument has no programs.
+        """
+        for split in self.splits(arguments, size - 1):
+            if all(self.count_exact(argument, argument_size) for argument, argument_size in zip(arguments, split)):
+                yield split
+
+    def count_exact(self, node, size):
+        """
+        Number of programs of `node` with exactly `size` nodes.
+        """
+        if not self.counts:
+            # filled level by level, since the arguments of an edge are smaller than its programs
+            self.counts = [[0] * (self.global_bound + 1) for _ in range(len(self))]
+            for level in range(1, self.global_bound + 1):
+                for counted, edges in zip(self.counts, self.edges):
+                    for production, arguments in edges:
+                        if not arguments:
+                            counted[level] += level == 1
+                            continue
+                        for split in self.splits(arguments, level - 1):
+                            product = 1
+                            for argument, argument_size in zip(arguments, split):
+                                product *= self.counts[argument][argument_size]
+                                if not product:
+                                    break
+                            counted[level] += product
+        return self.counts[node][size] if size <= self.global_bound else 0
+
+    def count(self, global_bound=None):
+        """
+        Number of programs of the root with at most `global_bound` nodes (by default the bound of the space).
+        """
+        if self.root is None:
+            return 0
+        global_bound = self.global_bound if global_bound is None else min(global_bound, self.global_bound)
+        return sum(self.count_exact(self.root, size) for size in range(1, global_bound + 1))
+
+    def programs(self, node, size):
+        """
+        Generates the programs of `node` with exactly `size` nodes.
+        """
+        for production, arguments in self.edges[node]:
+            if not arguments:
+                if size == 1:
+                    yield production
+                continue
+            for partition in self.partitions(arguments, size):
+                for combination in itertools.product(*[list(self.programs(argument, argument_size)) for argument, argument_size in zip(arguments, partition)]):
+                    yield production(*combination)
+
+    def ranked(self, node, size, costs, memo):
+        """
+        Lazily ranked programs of `node` with exactly `size` nodes: a `RankedPrograms` of (cost, program) pairs
+        by increasing total production cost. The argument lists of every (edge, size split) are merged with
+        a heap, advancing one argument at a time from the cheapest combination.
+        """
+        key = (node, size)
+        if key in memo:
+            return memo[key]
+
+        def generate():
+            heap, seen, sources = [], set(), []
+            for production, arguments in self.edges[node]:
+                if not arguments:
+                    if size == 1:
+                        sources.append((production, []))
+                    continue
+                for partition in self.partitions(arguments, size):
+                    sources.append((production, [self.ranked(argument, argument_size, costs, memo) for argument, argument_size in zip(arguments, partition)]))
+
+            def push(source, indices):
+                production, streams = sources[source]
+                if (source, indices) in seen:
+                    return
+                seen.add((source, indices))
+                if not streams:
+                    heapq.heappush(heap, (production_cost(costs, type(production)), source, indices, production))
+                    return
+                items = [stream.get(index) for stream, index in zip(streams, indices)]
+                if None not in items:
+                    cost = production_cost(costs, production) + sum(cost for cost, _ in items)
+                    heapq.heappush(heap, (cost, source, indices, production(*[program for _, program in items])))
+
+            for source, (_, streams) in enumerate(sources):
+                push(source, (0,) * len(streams))
+            while heap:
+                cost, source, indices, program = heapq.heappop(heap)
+                yield cost, program
+                for position in range(len(indices)):
+                    push(source, indices[:position] + (indices[position] + 1,) + indices[position + 1:])
+
+        memo[key] = RankedPrograms(generate())
+        return memo[key]
+
+    def top_k(self, k, costs=None):
+        """
+        Returns the `k` programs of the root with the smallest total production cost (see pcfg.py), or the
+        smallest size without `costs`, as (cost, program) pairs.
+        """
+        if self.root is None:
+            return []
+        memo = {}
+        streams = [self.ranked(self.root, size, costs, memo) for size in range(self.sizes[self.root], self.global_bound + 1)]
+        heap = []
+        for stream_index, stream in enumerate(streams):
+            item = stream.get(0)
+            if item is not None:
+                heapq.heappush(heap, (item[0], stream_index, 0, item[1]))
+        best = []
+        while heap and len(best) < k:
+            cost, stream_index, index, program = heapq.heappop(heap)
+            best.append((cost, program))
+            item = streams[stream_index].get(index + 1)
+            if item is not None:
+                heapq.heappush(heap, (item[0], stream_index, index + 1, item[1]))
+        return best
+
+    def rooted(self):
+        """
+        Returns the version space of the programs consistent with every example. A terminal and an enumerated
+        program may have the same outputs, so the root joins the edges of every node with the target outputs.
+        """
+        target = tuple(output.evaluate({}) for _, output in self.input_outputs)
+        return self.restrict([node for node in range(len(self)) if self.outputs[node] == target])
+
+    def intersect(self, inputs, output):
+        """
+        Returns the version space of the programs that are also consistent with the example (inputs, output).
+        """
+        return self.split(inputs, output).rooted()
+
+    def split(self, inputs, output):
+        """
+        Returns this space with the example (inputs, output) added, and its nodes split by their value on the new
+        input. Only the edges of this space are followed, and they are evaluated on the new example alone, so
+        programs that were equivalent so far become representatives of their own node when they diverge.
+        New nodes are finished in order of their smallest size, and each is joined with the finished nodes of
+        the other arguments of the edges that use it, so that every combination of argument nodes is applied once.
+        """
+        space = VersionSpace(self.global_bound, self.input_outputs + [(inputs, output)])
+        nodes = {}  # (node, value on the new example) -> node of the new space
+        values = []
+        finished = [[] for _ in range(len(self))]  # node -> finished nodes of the new space, by increasing size
+        uses = [[] for _ in range(len(self))]  # node -> edges that have it as an argument
+        for node, edges in enumerate(self.edges):
+            for production, arguments in edges:
+                for argument in set(arguments):
+                    uses[argument].append((node, production, arguments))
+
+        heap = []
+        for node, edges in enumerate(self.edges):
+            for production, arguments in edges:
+                if not arguments:
+                    heap.append((1, len(heap), node, production.evaluate(inputs), production, ()))
+        heapq.heapify(heap)
+        counter = len(heap)
+
+        def combinations(groups, budget):
+            # products of the groups whose sizes fit in `budget`; groups are sorted by size
+            if not groups:
+                yield ()
+                return
+            rest = sum(space.sizes[group[0]] for group in groups[1:])
+            for new_node in groups[0]:
+                if space.sizes[new_node] + rest > budget:
+                    break
+                for combination in combinations(groups[1:], budget - space.sizes[new_node]):
+                    yield (new_node,) + combination
+
+        while heap:
+            size, _, node, value, production, arguments = heapq.heappop(heap)
+            if (node, value) in nodes:
+                space.edges[nodes[(node, value)]].append((production, arguments))
+                continue
+            new_node = nodes[(node, value)] = space.add_node(self.outputs[node] + (value,), size)
+            space.edges[new_node].append((production, arguments))
+            values.append(value)
+            for parent, parent_production, parent_arguments in uses[node]:
+                for position, argument in enumerate(parent_arguments):
+                    if argument != node:
+                        continue
+                    # earlier positions may reuse the new node, later ones only older nodes, so no combination repeats
+                    groups = [finished[other] + ([new_node] if other == node else []) for other in parent_arguments[:position]] + \
+                        [[new_node]] + [finished[other] for other in parent_arguments[position + 1:]]
+                    if all(groups):
+                        for combination in combinations(groups, self.global_bound - 1):
+                            parent_value = parent_production.apply(*[values[argument] for argument in combination])
+                            if parent_value is not ERROR:
+                                heapq.heappush(heap, (1 + sum(space.sizes[argument] for argument in combination), counter,
+                                                      parent, parent_value, parent_production, combination))
+                                counter += 1
+            finished[node].append(new_node)
+        return space
+
+class RankedPrograms():
+    """
+    List of (cost, program) pairs filled on demand from a generator, so that every ranked stream is shared.
+    """
+
+    def __init__(self, generator):
+        self.items = []
+        self.generator = generator
+
+    def get(self, index):
+        while len(self.items) <= index:
+            item = next(self.generator, None)
+            if item is None:
+                return None
+            self.items.append(item)
+        return self.items[index]
+
+def program_space(global_bound, operators, input_outputs, terminals=None):
+    """
+    Builds the version space of every program up to `global_bound`, with one node per distinct outputs on
+    `input_outputs` and no root. The bottom-up enumeration records, for every evaluated program, an edge from
+    the row of its outputs to its operator and argument rows, so equivalent programs share a node instead of being discarded.
+    """
+    bank = ProgramBank()
+    edges = {}
+
+    def record(row, operator_id, arguments):
+        edges.setdefault(row, []).append((bank.operators[operator_id], arguments))
+
+    for _ in bottom_up_generator(global_bound, operators, input_outputs, bank, terminals=terminals, derivations=record):
+        pass
+
+    space = VersionSpace(global_bound, input_outputs)
+    for row in range(len(bank)):
+        space.add_node(bank.outputs[row], bank.sizes[row])
+        space.edges[row] = [(bank.expression(row), ())] if bank.operator_ids[row] < 0 else edges.get(row, [])
+    return space
+
+def version_space_xml(global_bound, operators, input_outputs, terminals=None):
+    """
+    Builds the version space of every program up to `global_bound` that is consistent with `input_outputs`.
+    """
+    return program_space(global_bound, operators, input_outputs, terminals).rooted()
+
+def test_version_space():
+    """
+    Builds the version space of test cases 1-10 one above the size of their smallest solution and lists its
+    best programs, then intersects the spaces of test cases that share a transformation with the example of
+    the other case, and checks the result against the space built from both examples.
+    """
+
+    def run_space(case_number, test_case):
+        program, _ = bottom_up_xml(20, operators, test_case)
+        bound = expression_size(program) + 1
+        start_time = time.time()
+        space = version_space_xml(bound, operators, test_case)
+        best = space.top_k(3)
+        elapsed = time.time() - start_time
+        solved = bool(best) and best[0][0] == expression_size(program) and all(solves(candidate, test_case) for _, candidate in best)
+        yield solved, (case_number, bound, len(space), space.edge_count(), space.count(), elapsed, best[0][1] if best else None)
+    points, possible = harness_table(["test case", "bound", "nodes", "edges", "programs", "time (s)", "best program"], run_space)
+
+    def run_intersection(label, pair):
+        first, second = pair
+        program, _ = bottom_up_xml(20, operators, base_test_cases[first - 1])
+        bound = expression_size(program) + 1
+        space = version_space_xml(bound, operators, base_test_cases[first - 1])
+        start_time = time.time()
+        intersected = space.intersect(*base_test_cases[second - 1][0])
+        intersect_time = time.time() - start_time
+        start_time = time.time()
+        rebuilt = version_space_xml(bound, operators, base_test_cases[first - 1] + base_test_cases[second - 1], make_terminals(base_test_cases[first - 1]))
+        rebuild_time = time.time() - start_time
+        yield intersected.count() == rebuilt.count() > 0, \
+            (label, space.count(), intersected.count(), rebuilt.count(), intersect_time, rebuild_time)
+    print()
+    pairs = [(1, 6), (2, 7), (2, 8), (3, 9), (5, 10)]
+    pair_points, pair_possible = harness_table(["cases", "programs", "intersect", "rebuilt", "time (s)", "rebuild"], run_intersection,
+                                               [(f"{first}, {second}", (first, second)) for first, second in pairs])
+    return report("Version Space", points + pair_points, possible + pair_possible)
+
+if __name__ == "__main__":
+    test_version_space()
@@ -1,33 +1,341 @@
+import inspect
+import weakref
+from collections import OrderedDict
 import xml.etree.ElementTree as ET
 
-class Expression():
+class XMLValue():
+    """
+    Immutable, interned value of an `xml` expression.
+    Structurally equal values are the same object, so equality is identity and the hash is computed once.
+    Operators return new values that share every unchanged field (including the child) with their input.
+    """
+    __slots__ = ("tag", "attributes", "text", "child", "_hash", "__weakref__")
+
+    # all live values, keyed by (tag, attributes, text, child); values that are no longer used are dropped
+    _interned = weakref.WeakValueDictionary()
+
+    def __new__(cls, tag, attributes, text, child):
+        key = (tag, attributes, text, child)
+        value = cls._interned.get(key)
+        if value is None:
+            value = object.__new__(cls)
+            object.__setattr__(value, "tag", tag)
+            object.__setattr__(value, "attributes", attributes)  # tuple of (key, value) sorted by key
+            object.__setattr__(value, "text", text)
+            object.__setattr__(value, "child", child)  # XMLValue or None
+            object.__setattr__(value, "_hash", hash(key))
+            cls._interned[key] = value
+        return value
+
+    @classmethod
+    def make(cls, tag, attributes, text, child):
+        """
+        Builds a value from an attribute dictionary.
+        """
+        return cls(tag, tuple(sorted(attributes.items())), text, child)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("XMLValue is immutable")
+
+    def __hash__(self):
+        return self._hash
+
+    def __reduce__(self):
+        # re-intern on unpickling
+        return (XMLValue, (self.tag, self.attributes, self.text, self.child))
+
+    def __repr__(self):
+        return f"XMLValue({self.tag!r}, {dict(self.attributes)!r}, {self.text!r}, {self.child!r})"
+
+    def get_attribute(self, name):
+        for key, value in self.attributes:
+            if key == name:
+                return value
+        return None
+
+    def with_attribute(self, name, value):
+        attributes = dict(self.attributes)
+        attributes[name] = value
+        return XMLValue(self.tag, tuple(sorted(attributes.items())), self.text, self.child)
+
+    def without_attribute(self, name):
+        attributes = tuple((key, value) for key, value in self.attributes if key != name)
+        if len(attributes) == len(self.attributes):
+            return self
+        return XMLValue(self.tag, attributes, self.text, self.child)
+
+    def with_tag(self, tag):
+        return XMLValue(tag, self.attributes, self.text, self.child)
+
+    def with_text(self, text):
+        return XMLValue(self.tag, self.attributes, text, self.child)
+
+    def with_child(self, child):
+        return XMLValue(self.tag, self.attributes, self.text, child)
+
+    def to_xml_tag(self):
+        """
+        Converts the value back into an `XMLTag` expression.
+        """
+        return XMLTag(
+            ConstantString(self.tag, "tag") if self.tag is not None else None,
+            [(ConstantString(k, "key"), ConstantString(v)) for k, v in self.attributes],
+            ConstantString(self.text) if self.text is not None else None,
+            self.child.to_xml_tag() if self.child is not None else None
+        )
+
+class ErrorValue():
+    """
+    Value of a program that fails on an example: `ExtractChild` of an element without a child, or
+    `ExtractAttribute` of a missing key, or `SetTag` and `SetAttribute` given a None tag or value.
+    A missing tag or text is not a failure, it is None, and `SetText` turns it into a text removal.
+    Operators propagate it, and the bottom-up enumerator discards programs that produce it.
+    """
+    __slots__ = ()
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = object.__new__(cls)
+        return cls._instance
+
+    def __repr__(self):
+        return "ERROR"
+
+    def __reduce__(self):
+        # unpickles to the module-level singleton
+        return "ERROR"
+
+ERROR = ErrorValue()
+
+class ValueStore():
+    """
+    Interns output values (strings, XMLValues, None) to dense integer ids, so that a program's
+    behavior can be represented as a row of ids whose size does not depend on the values' text.
+    """
+
+    def __init__(self):
+        self.ids = {}  # value -> id
+        self.values = []  # id -> value
+
+    def __len__(self):
+        return len(self.values)
+
+    def id(self, value):
+        value_id = self.ids.get(value)
+        if value_id is None:
+            value_id = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return value_id
+
+class ApplicationMemo():
+    """
+    Bounded LRU memo of operator applications, keyed by the operator and the values of its arguments.
+    XMLValues are interned, so a key hashes in O(1) per argument, and the memo holds no value beyond its
+    `capacity` entries. Syntactically different programs whose arguments evaluate to the same values share one application.
+    `hits` and `misses` count lookups, so the saved work can be reported per task.
+    """
+
+    def __init__(self, capacity=1 << 20):
+        self.capacity = capacity
+        self.results = OrderedDict()  # (operator, argument values...) -> output value
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.results)
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def applier(self, operator):
+        """
+        Returns a drop-in replacement for `operator.apply` that goes through the memo.
+        """
+        results = self.results
+        operator_apply = operator.apply
+
+        def apply(*argument_values):
+            key = (operator, *argument_values)
+            if key in results:
+                self.hits += 1
+                results.move_to_end(key)
+                return results[key]
+            self.misses += 1
+            value = results[key] = operator_apply(*argument_values)
+            if len(results) > self.capacity:
+                results.popitem(last=False)
+            return value
+        return apply
+
+def _freeze(argument):
+    # attribute lists of XMLTag become tuples so they can be part of a hash-consing key
+    if isinstance(argument, (list, tuple)):
+        return tuple(_freeze(a) for a in argument)
+    return argument
+
+class _InternedRef(weakref.ref):
+    # weak reference that remembers its key in the intern table
+    __slots__ = ("key",)
+
+class HashConsed(type):
+    """
+    Metaclass that hash-conses expressions: constructing an expression from the same class and
+    arguments as a live expression returns the existing object. Equality of expressions is
+    therefore identity, and the structural hash is computed once from the arguments' cached hashes.
+    """
+
+    def __init__(cls, name, bases, namespace):
+        super().__init__(name, bases, namespace)
+        # key -> weak reference, so expressions that are no longer used are dropped from the table
+        interned = cls._interned = {}
+
+        def forget(reference):
+            if interned.get(reference.key) is reference:
+                del interned[reference.key]
+        cls._forget = staticmethod(forget)
+        parameters = list(inspect.signature(cls.__init__).parameters.values())[1:]
+        cls._defaults = tuple(p.default for p in parameters if p.default is not inspect.Parameter.empty)
+        cls._arity = len(parameters)
+
+    def __call__(cls, *args, **kwargs):
+        if kwargs:
+            bound = inspect.signature(cls.__init__).bind(None, *args, **kwargs)
+            args = tuple(bound.arguments.values())[1:]
+        if len(args) < cls._arity:
+            # fill in defaults so that e.g. ExtractAttribute(x) and ExtractAttribute(x, None) are shared
+            args = args + cls._defaults[len(cls._defaults) - (cls._arity - len(args)):]
+        frozen = tuple(_freeze(a) for a in args) if cls._freeze_arguments else args
+        key = (cls,) + frozen
+        reference = cls._interned.get(key)
+        expression = reference() if reference is not None else None
+        if expression is None:
+            expression = super().__call__(*args)
+            expression._arguments = args
+            expression._hash = hash((cls.__name__,) + frozen)
+            reference = _InternedRef(expression, cls._forget)
+            reference.key = key
+            cls._interned[key] = reference
+        return expression
+
+class Expression(metaclass=HashConsed):
+    # nodes are slotted to keep large banks compact; `_arguments` and `_hash` are set by HashConsed
+    __slots__ = ("_arguments", "_hash", "_compiled", "__weakref__")
+
+    # set by classes that take list arguments
+    _freeze_arguments = False
 
     def evaluate(self, environment):
+        argument_values = [argument.evaluate(environment) for argument in self.arguments()]
+        # a failing argument makes the whole program fail
+        if ERROR in argument_values:
+            return ERROR
+        return self.apply(*argument_values)
+
+    @staticmethod
+    def apply(*argument_values):
+        """
+        Computes the operator's output from the values of its arguments.
+        Used by `evaluate`, by compiled closures, and directly by the bottom-up
+        enumerator on the stored outputs of bank entries. Arguments are never ERROR:
+        `evaluate` and compiled closures propagate it, and the enumerator never stores it.
+        """
         assert False, "not implemented"
 
     def arguments(self):
         assert False, "not implemented"
 
+    def compile(self):
+        """
+        Returns a closure `environment -> value` equivalent to `evaluate`.
+        The closure is cached on the expression, so compiling a new expression whose
+        arguments were already compiled only builds one closure.
+        The bottom-up enumerator does not use it: it applies operators to the stored outputs of bank entries
+        (see `apply`). Compiled closures verify finished programs, e.g. against a CEGIS corpus or with `--compiled`.
+        """
+        compiled = getattr(self, "_compiled", None)
+        if compiled is None:
+            compiled = self._compile()
+            self._compiled = compiled
+        return compiled
+
+    def _compile(self):
+        apply = self.apply
+        arguments = [argument.compile() for argument in self.arguments()]
+        # like `evaluate`, an ERROR argument is returned without applying the operator
+        if len(arguments) == 1:
+            first, = arguments
+
+            def compiled(environment):
+                value = first(environment)
+                return ERROR if value is ERROR else apply(value)
+            return compiled
+        if len(arguments) == 2:
+            first, second = arguments
+
+            def compiled(environment):
+                first_value, second_value = first(environment), second(environment)
+                if first_value is ERROR or second_value is ERROR:
+                    return ERROR
+                return apply(first_value, second_value)
+            return compiled
+        if len(arguments) == 3:
+            first, second, third = arguments
+
+            def compiled(environment):
+                first_value, second_value, third_value = first(environment), second(environment), third(environment)
+                if first_value is ERROR or second_value is ERROR or third_value is ERROR:
+                    return ERROR
+                return apply(first_value, second_value, third_value)
+            return compiled
+
+        def compiled(environment):
+            argument_values = [argument(environment) for argument in arguments]
+            return ERROR if ERROR in argument_values else apply(*argument_values)
+        return compiled
+
     def __repr__(self):
         return str(self)
 
-    def __eq__(self, other):
-        return str(self) == str(other)
+    def __reduce__(self):
+        # re-intern on unpickling
+        return (self.__class__, self._arguments)
+
+    # expressions are hash-consed, so structurally equal expressions are the same object
+    def __eq__(self, other): return self is other
 
-    def __hash__(self): return hash(str(self))
+    def __hash__(self): return self._hash
 
-    def __ne__(self, other): return str(self) != str(other)
+    def __ne__(self, other): return self is not other
 
     def __gt__(self, other): return str(self) > str(other)
 
     def __lt__(self, other): return str(self) < str(other)
         
+# sorts of harvested string constants: tag names, attribute keys, and attribute values or text.
+# Strings computed by the Extract operators are of the generic type "str", which every sort accepts,
+# so an extracted string can move across sorts (e.g. an attribute value can become a tag).
+string_sorts = ["tag", "key", "value"]
+
+def accepted_types(argument_type):
+    """
+    The types of the programs that can fill an argument of `argument_type`.
+    """
+    return [argument_type, "str"] if argument_type in string_sorts else [argument_type]
+
 class ConstantString(Expression):
-    return_type = "str"
+    __slots__ = ("content", "sort")
     argument_types = []
     
-    def __init__(self, content):
+    def __init__(self, content, sort="value"):
         self.content = content
+        self.sort = sort  # one of `string_sorts`
+
+    @property
+    def return_type(self):
+        return self.sort
 
     def __str__(self):
         return f'ConstantString("{self.content}")'
@@ -36,6 +344,10 @@ class ConstantString(Expression):
         # output plain string content instead of wrapping it
         return self.content
     
+    def _compile(self):
+        content = self.content
+        return lambda environment: content
+
     def arguments(self):
         return []
     
@@ -43,8 +355,10 @@ class ConstantString(Expression):
         return self.content
 
 class XMLTag(Expression):
+    __slots__ = ("tag", "attributes", "text", "child", "_value")
     return_type = "xml"
     argument_types = []
+    _freeze_arguments = True
 
     def __init__(self, tag, attributes, text, child):
         self.tag = tag  # ConstantString or None
@@ -60,28 +374,33 @@ class XMLTag(Expression):
         return f"XMLTag({tag}, {attributes}, {text}, {child})"
     
     def evaluate(self, environment):
-        tag = self.tag.evaluate(environment) if self.tag else None
-        attributes = {
-            k.evaluate(environment): v.evaluate(environment)
-            for k, v in (self.attributes or [])
-            if k.evaluate(environment) is not None
-        }
-        text = self.text.evaluate(environment) if self.text else None
-        child = self.child.evaluate(environment) if self.child else None
-        return {
-            "tag": tag,
-            "attributes": attributes,
-            "text": text,
-            "children": child  # single child or None
-        }
+        # the fields are constants, so the value is computed once and shared by every evaluation
+        value = getattr(self, "_value", None)
+        if value is None:
+            tag = self.tag.evaluate(environment) if self.tag else None
+            attributes = {
+                k.evaluate(environment): v.evaluate(environment)
+                for k, v in (self.attributes or [])
+                if k.evaluate(environment) is not None
+            }
+            text = self.text.evaluate(environment) if self.text else None
+            child = self.child.evaluate(environment) if self.child else None
+            value = XMLValue.make(tag, attributes, text, child)
+            self._value = value
+        return value
+
+    def _compile(self):
+        value = self.evaluate({})
+        return lambda environment: value
 
     def arguments(self):
         args = [self.tag] + (self.attributes or []) + ([self.text] if self.text else []) + ([self.child] if self.child else [])
         return args
 
 class ExtractAttribute(Expression):
+    __slots__ = ("xml_expr", "attr_name")
     return_type = "str"
-    argument_types = ["xml", "str"]
+    argument_types = ["xml", "key"]
 
     def __init__(self, xml_expr, attr_name=None):
         self.xml_expr = xml_expr
@@ -91,20 +410,36 @@ class ExtractAttribute(Expression):
         attr_name = str(self.attr_name) if self.attr_name else "none"
         return f"ExtractAttribute({self.xml_expr}, {attr_name})"
 
+    @staticmethod
+    def apply(xml, attr_name):
+        value = xml.get_attribute(attr_name)
+        # a missing attribute is an error
+        return ERROR if value is None else value
+
     def evaluate(self, environment):
-        xml = self.xml_expr.evaluate(environment)
-        if self.attr_name:
-            attr_name = self.attr_name.evaluate(environment)
-            return xml["attributes"].get(attr_name, None)
-        # dynamically collect all attribute names and values
-        return xml["attributes"]
+        if not self.attr_name:
+            # dynamically collect all attribute names and values
+            xml = self.xml_expr.evaluate(environment)
+            return ERROR if xml is ERROR else dict(xml.attributes)
+        return super().evaluate(environment)
+
+    def _compile(self):
+        if not self.attr_name:
+            xml_expr = self.xml_expr.compile()
+
+            def compiled(environment):
+                xml = xml_expr(environment)
+                return ERROR if xml is ERROR else dict(xml.attributes)
+            return compiled
+        return super()._compile()
 
     def arguments(self):
         return [self.xml_expr] + ([self.attr_name] if self.attr_name else [])
 
 class SetAttribute(Expression):
+    __slots__ = ("xml_expr", "attr_name", "attr_value")
     return_type = "xml"
-    argument_types = ["xml", "str", "str"]
+    argument_types = ["xml", "key", "value"]
 
     def __init__(self, xml_expr, attr_name, attr_value):
         self.xml_expr = xml_expr
@@ -114,18 +449,18 @@ class SetAttribute(Expression):
     def __str__(self):
         return f"SetAttribute({self.xml_expr}, {self.attr_name}, {self.attr_value})"
 
-    def evaluate(self, environment):
-        xml = self.xml_expr.evaluate(environment)
-        attr_name = self.attr_name.evaluate(environment)
-        attr_value = self.attr_value.evaluate(environment)
-        if attr_name is not None:
-            xml["attributes"][attr_name] = attr_value
-        return xml
+    @staticmethod
+    def apply(xml, attr_name, attr_value):
+        if attr_name is None:
+            return xml
+        # an attribute without a value cannot be written as XML
+        return ERROR if attr_value is None else xml.with_attribute(attr_name, attr_value)
 
     def arguments(self):
         return [self.xml_expr, self.attr_name, self.attr_value]
 
 class ExtractChild(Expression):
+    __slots__ = ("xml_expr",)
     return_type = "xml"
     argument_types = ["xml"]
 
@@ -135,22 +470,18 @@ class ExtractChild(Expression):
     def __str__(self):
         return f"ExtractChild({self.xml_expr})"
 
-    def evaluate(self, environment):
-        # extract XML obj from the given expression
-        xml = self.xml_expr.evaluate(environment)
-        
-        # get single child elem if it exists
-        child = xml.get("children", None)
-        if child is not None:
-            return child
-        return None  # return None if no child exists
+    @staticmethod
+    def apply(xml):
+        # get single child elem if it exists, ERROR otherwise
+        return ERROR if xml.child is None else xml.child
 
     def arguments(self):
         return [self.xml_expr]
 
 class SetChild(Expression):
+    __slots__ = ("xml_expr", "child_tag", "child_value")
     return_type = "xml"
-    argument_types = ["xml", "str", "xml"]
+    argument_types = ["xml", "tag", "xml"]
 
     def __init__(self, xml_expr, child_tag, child_value):
         self.xml_expr = xml_expr
@@ -160,24 +491,16 @@ class SetChild(Expression):
     def __str__(self):
         return f"SetChild({self.xml_expr}, {self.child_tag}, {self.child_value})"
 
-    def evaluate(self, environment):
-        xml = self.xml_expr.evaluate(environment)
-        child_tag = self.child_tag.evaluate(environment)
-        child_value = self.child_value.evaluate(environment)
-
-        # replace child only if the tags match
-        if xml.get("children") and xml["children"]["tag"] == child_tag:
-            xml["children"] = child_value
-        else:
-            # if there is no child or tag does not match, just set the child
-            xml["children"] = child_value
-
-        return xml
+    @staticmethod
+    def apply(xml, child_tag, child_value):
+        # the child is replaced whether or not its tag matches `child_tag`
+        return xml.with_child(child_value)
 
     def arguments(self):
         return [self.xml_expr, self.child_tag, self.child_value]
     
 class XMLVariable(Expression):
+    __slots__ = ("name",)
     return_type = "xml"
     argument_types = []
 
@@ -193,12 +516,17 @@ class XMLVariable(Expression):
     def evaluate(self, environment):
         return environment[self.name].evaluate({})
 
+    def _compile(self):
+        name = self.name
+        return lambda environment: environment[name].evaluate({})
+
     def arguments(self):
         return []
     
 class SetTag(Expression):
+    __slots__ = ("xml_expr", "tag_value")
     return_type = "xml"
-    argument_types = ["xml", "str"]
+    argument_types = ["xml", "tag"]
 
     def __init__(self, xml_expr, tag_value):
         self.xml_expr = xml_expr
@@ -207,16 +535,16 @@ class SetTag(Expression):
     def __str__(self):
         return f"SetTag({self.xml_expr}, {self.tag_value})"
 
-    def evaluate(self, environment):
-        xml = self.xml_expr.evaluate(environment)
-        tag_value = self.tag_value.evaluate(environment)
-        xml["tag"] = tag_value
-        return xml
+    @staticmethod
+    def apply(xml, tag_value):
+        # an element without a tag cannot be written as XML
+        return ERROR if tag_value is None else xml.with_tag(tag_value)
 
     def arguments(self):
         return [self.xml_expr, self.tag_value]
     
 class ExtractTag(Expression):
+    __slots__ = ("xml_expr",)
     return_type = "str"
     argument_types = ["xml"]
 
@@ -226,15 +554,16 @@ class ExtractTag(Expression):
     def __str__(self):
         return f"ExtractTag({self.xml_expr})"
 
-    def evaluate(self, environment):
-        xml = self.xml_expr.evaluate(environment)
+    @staticmethod
+    def apply(xml):
         # return the tag from the XML structure
-        return xml.get("tag")
+        return xml.tag
 
     def arguments(self):
         return [self.xml_expr]
     
 class ExtractText(Expression):
+    __slots__ = ("xml_expr",)
     return_type = "str"
     argument_types = ["xml"]
 
@@ -244,17 +573,19 @@ class ExtractText(Expression):
     def __str__(self):
         return f"ExtractText({self.xml_expr})"
 
-    def evaluate(self, environment):
-        xml = self.xml_expr.evaluate(environment)
-        # return the text from the XML structure
-        return xml.get("text")
+    @staticmethod
+    def apply(xml):
+        # return the text from the XML structure, None if there is none, so that
+        # SetText(x, ExtractText(y)) copies the text or removes it
+        return xml.text
 
     def arguments(self):
         return [self.xml_expr]
     
 class SetText(Expression):
+    __slots__ = ("xml_expr", "text_value")
     return_type = "xml"
-    argument_types = ["xml", "str"]
+    argument_types = ["xml", "value"]
 
     def __init__(self, xml_expr, text_value):
         self.xml_expr = xml_expr
@@ -263,20 +594,18 @@ class SetText(Expression):
     def __str__(self):
         return f"SetText({self.xml_expr}, {self.text_value})"
 
-    def evaluate(self, environment):
-        # eval XML object and new text value
-        xml = self.xml_expr.evaluate(environment)
-        text_value = self.text_value.evaluate(environment)
+    @staticmethod
+    def apply(xml, text_value):
         # update text field of the XML
-        xml["text"] = text_value
-        return xml
+        return xml.with_text(text_value)
 
     def arguments(self):
         return [self.xml_expr, self.text_value]
     
 class RemoveAttribute(Expression):
+    __slots__ = ("xml_expr", "attr_name")
     return_type = "xml"
-    argument_types = ["xml", "str"]
+    argument_types = ["xml", "key"]
 
     def __init__(self, xml_expr, attr_name):
         self.xml_expr = xml_expr
@@ -285,19 +614,16 @@ class RemoveAttribute(Expression):
     def __str__(self):
         return f"RemoveAttribute({self.xml_expr}, {self.attr_name})"
 
-    def evaluate(self, environment):
-        # eval the XML object and attribute name
-        xml = self.xml_expr.evaluate(environment)
-        attr_name = self.attr_name.evaluate(environment)
+    @staticmethod
+    def apply(xml, attr_name):
         # rm specified attribute
-        if attr_name in xml["attributes"]:
-            del xml["attributes"][attr_name]
-        return xml
+        return xml.without_attribute(attr_name)
 
     def arguments(self):
         return [self.xml_expr, self.attr_name]
 
 class RemoveChild(Expression):
+    __slots__ = ("xml_expr",)
     return_type = "xml"
     argument_types = ["xml"]
 
@@ -307,16 +633,16 @@ class RemoveChild(Expression):
     def __str__(self):
         return f"RemoveChild({self.xml_expr})"
 
-    def evaluate(self, environment):
-        xml = self.xml_expr.evaluate(environment)
+    @staticmethod
+    def apply(xml):
         # rm child by setting it to None
-        xml["children"] = None
-        return xml
+        return xml.with_child(None)
 
     def arguments(self):
         return [self.xml_expr]
 
 class RemoveText(Expression):
+    __slots__ = ("xml_expr",)
     return_type = "xml"
     argument_types = ["xml"]
 
@@ -326,15 +652,33 @@ class RemoveText(Expression):
     def __str__(self):
         return f"RemoveText({self.xml_expr})"
 
-    def evaluate(self, environment):
-        xml = self.xml_expr.evaluate(environment)
+    @staticmethod
+    def apply(xml):
         # rm text by setting it to None
-        xml["text"] = None
-        return xml
+        return xml.with_text(None)
 
     def arguments(self):
         return [self.xml_expr]
     
+# the operators of the DSL, in enumeration order
+operators = [
+    ExtractTag, ExtractAttribute, ExtractText, ExtractChild,
+    SetTag, SetAttribute, SetText, SetChild,
+    RemoveAttribute, RemoveChild, RemoveText
+]
+
+def expression_size(expr):
+    """
+    Number of nodes of `expr`.
+    """
+    return 1 + sum(expression_size(argument) for argument in expr.arguments())
+
+def solves(program, input_outputs):
+    """
+    Whether `program` is not None and evaluates to the output of every (inputs, output) pair.
+    """
+    return program is not None and all(program.evaluate(inputs) == output.evaluate({}) for inputs, output in input_outputs)
+
 def xml_to_dsl(xml_string):
     """
     Converts an XML string into a DSL representation using XMLTag and ConstantString.
@@ -346,16 +690,16 @@ def xml_to_dsl(xml_string):
         Recursively parses an ElementTree element into a DSL XMLTag.
         """
         # extract tag
-        tag = ConstantString(element.tag)
+        tag = ConstantString(element.tag, "tag")
         
         # extract attribs
         attributes = [
-            (ConstantString(k), ConstantString(v))
+            (ConstantString(k, "key"), ConstantString(v, "value"))
             for k, v in element.attrib.items()
         ]
         
         # extract text content
-        text = ConstantString(element.text.strip()) if element.text and element.text.strip() else None
+        text = ConstantString(element.text.strip(), "value") if element.text and element.text.strip() else None
         
         # recursively parse child elements
         children = None
@@ -0,0 +1,212 @@
+import sys
+import os
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'bottom_up')))
+from dsl import *
+from test_cases import *
+from harness import run_harness
+from bottom_up import ProgramBank, bottom_up_generator, bottom_up_xml
+
+# A goal is the tuple of desired values of an xml program, one per example.
+# Fields are "tag", ("attribute", key), "text" and "child". A goal is solved by a program of the bank (the residual)
+# with an update operator on top for every field where the residual differs from the goal. Updates of different
+# fields commute, so they are applied in `field_order` and every differing field is peeled in one step.
+# Witness functions invert the update of one field: given the goal, they return the operator and the goals of its
+# arguments other than the updated xml value, as ("xml", values) for an xml argument, (sort, values) for a string
+# argument, or (sort, None) for a string argument whose value does not matter; or None if no update fits.
+
+def witness_tag(values, field):
+    tags = tuple(value.tag for value in values)
+    # SetTag fails on a None tag, so no update removes the tag
+    if any(tag is None for tag in tags):
+        return None
+    return SetTag, [("tag", tags)]
+
+def witness_attribute(values, field):
+    attributes = tuple(value.get_attribute(field[1]) for value in values)
+    if all(attribute is not None for attribute in attributes):
+        return SetAttribute, [("key", (field[1],) * len(values)), ("value", attributes)]
+    if all(attribute is None for attribute in attributes):
+        return RemoveAttribute, [("key", (field[1],) * len(values))]
+    return None
+
+def witness_text(values, field):
+    # extracted text may be None, so SetText can also remove the text on some examples
+    if any(value.text is not None for value in values):
+        return SetText, [("value", tuple(value.text for value in values))]
+    return RemoveText, []
+
+def witness_child(values, field):
+    if all(value.child is not None for value in values):
+        # the child tag argument is ignored by SetChild
+        return SetChild, [("tag", None), ("xml", tuple(value.child for value in values))]
+    if all(value.child is None for value in values):
+        return RemoveChild, []
+    return None
+
+def field_witness(field):
+    if field == "tag":
+        return witness_tag
+    if field == "text":
+        return witness_text
+    if field == "child":
+        return witness_child
+    return witness_attribute
+
+def field_order(field):
+    """
+    Sort key of a field: the tag, then the attributes by key, then the text and the child.
+    """
+    if isinstance(field, tuple):
+        return (1, field[1])
+    return ({"tag": 0, "text": 2, "child": 3}[field], "")
+
+def differing_fields(residual, goal):
+    """
+    The fields where the values of `residual` differ from those of `goal` on some example.
+    """
+    fields = set()
+    for value, target in zip(residual, goal):
+        if value.tag != target.tag:
+            fields.add("tag")
+        if value.attributes != target.attributes:
+            attributes, target_attributes = dict(value.attributes), dict(target.attributes)
+            fields.update(("attribute", key) for key in attributes.keys() | target_attributes.keys()
+                          if attributes.get(key) != target_attributes.get(key))
+        if value.text != target.text:
+            fields.add("text")
+        if value.child is not target.child:
+            fields.add("child")
+    return fields
+
+class TopDownSynthesizer():
+    """
+    Deductive synthesizer: an xml goal is solved by a program of the bank, which holds every program up to
+    `leaf_bound` (enumerated bottom-up), with an update on top for every field where it differs from the goal.
+    The update of a field is found by its witness function; string arguments are taken from the bank, and the
+    child of SetChild is a goal of its own. Each field is updated once, so the goals are the target and the
+    chain of its children, and goals are memoized with their smallest program.
+    The search is not complete: programs larger than `leaf_bound` are only found if every operator above
+    the bank is an update of the result (e.g. ExtractChild(SetTag(...)) is not).
+    """
+
+    def __init__(self, operators, input_outputs, leaf_bound=4):
+        self.operators = set(operators)
+        self.bank = ProgramBank()
+        self.generated = sum(1 for _ in bottom_up_generator(leaf_bound, operators, input_outputs, self.bank))
+        # smallest row by (type, outputs), terminals included
+        self.rows = {}
+        for row in range(len(self.bank)):
+            key = (self.bank.type_names[self.bank.types[row]], self.bank.outputs[row])
+            if key not in self.rows or self.bank.sizes[row] < self.bank.sizes[self.rows[key]]:
+                self.rows[key] = row
+        # xml rows that can be the residual of a goal, smallest first
+        self.residuals = sorted((row for (type_name, outputs), row in self.rows.items() if type_name == "xml" and ERROR not in outputs),
+                                key=lambda row: self.bank.sizes[row])
+        self.solutions = {}
+        self.updates = {}
+
+    def solve_string(self, sort, values):
+        """
+        Returns the smallest (size, program) of the bank with these values, or of this sort if `values` is None.
+        Constants of the sort and extracted strings are both candidates (see `accepted_types`).
+        """
+        if values is not None:
+            rows = [self.rows[(type_name, values)] for type_name in accepted_types(sort) if (type_name, values) in self.rows]
+        else:
+            rows = [row for (type_name, _), row in self.rows.items() if type_name in accepted_types(sort)]
+        if not rows:
+            return None
+        row = min(rows, key=lambda row: self.bank.sizes[row])
+        return self.bank.sizes[row], self.bank.expression(row)
+
+    def update(self, values, field):
+        """
+        Returns (size, operator, arguments) of the smallest update that sets `field` to its value in `values`
+        (the size excludes the updated xml value), or None.
+        """
+        key = (values, field)
+        if key not in self.updates:
+            self.updates[key] = None
+            witness = field_witness(field)(values, field)
+            if witness is not None and witness[0] in self.operators:
+                operator, argument_goals = witness
+                size, arguments = 1, []
+                for argument_goal in argument_goals:
+                    if argument_goal[0] == "xml":
+                        solution = self.solve(argument_goal[1])
+                    else:
+                        solution = self.solve_string(*argument_goal)
+                    if solution is None:
+                        break
+                    size += solution[0]
+                    arguments.append(solution[1])
+                else:
+                    self.updates[key] = (size, operator, arguments)
+        return self.updates[key]
+
+    def solve(self, values):
+        """
+        Returns the smallest (size, program) whose value is `values` on every example, or None.
+        """
+        if values in self.solutions:
+            return self.solutions[values]
+        self.generated += 1
+
+        best = None
+        for row in self.residuals:
+            size = self.bank.sizes[row]
+            if best is not None and size >= best[0]:
+                break
+            updates = []
+            for field in sorted(differing_fields(self.bank.outputs[row], values), key=field_order):
+                update = self.update(values, field)
+                if update is None:
+                    break
+                size += update[0]
+                updates.append(update)
+            else:
+                if best is None or size < best[0]:
+                    best = (size, row, updates)
+        if best is not None:
+            size, row, updates = best
+            program = self.bank.expression(row)
+            for _, operator, arguments in updates:
+                program = operator(program, *arguments)
+            best = (size, program)
+        self.solutions[values] = best
+        return best
+
+def top_down_xml(global_bound, operators, input_outputs, leaf_bound=4):
+    """
+    global_bound: int. Upper bound on expression size.
+    operators: List of operator classes for XML.
+    input_outputs: List of input-output XML pairs.
+    leaf_bound: int. Size up to which programs are enumerated bottom-up for the leftover goals.
+    Returns (program, number of programs enumerated plus goals explored) like `bottom_up_xml`.
+    """
+    synthesizer = TopDownSynthesizer(operators, input_outputs, min(leaf_bound, global_bound))
+    solution = synthesizer.solve(tuple(output.evaluate({}) for _, output in input_outputs))
+    # the witnesses only build consistent programs, but a program that does not solve the task is never returned
+    if solution is None or solution[0] > global_bound or not solves(solution[1], input_outputs):
+        return None, synthesizer.generated
+    return solution[1], synthesizer.generated
+
+def test_top_down_xml():
+    """
+    Compares the top-down engine with `bottom_up_xml` on test cases 1-10.
+    """
+
+    def run(case_number, test_case):
+        start_time = time.time()
+        _, bottom_up_count = bottom_up_xml(20, operators, test_case)
+        bottom_up_time = time.time() - start_time
+        start_time = time.time()
+        program, top_down_count = top_down_xml(20, operators, test_case)
+        top_down_time = time.time() - start_time
+        yield solves(program, test_case), (case_number, bottom_up_count, top_down_count, bottom_up_time, top_down_time, program)
+    return run_harness("Top-Down Synthesis", ["test case", "bottom-up", "top-down", "time (s)", "top-down", "program"], run)
+
+if __name__ == "__main__":
+    test_top_down_xml()